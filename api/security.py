@@ -163,8 +163,9 @@ def checkToken(token):
 
 def userLoginAllowed(user):
     from orm.roles import AdminUserRoleRelation
-    return user.ID == 0 or (AdminUserRoleRelation.query.filter(AdminUserRoleRelation.userID == user.ID).count() != 0 and
-                            user.addressStatus == 0)
+    return user.ID == 0 or (user.addressStatus == 0 and
+                            AdminUserRoleRelation.query.filter(AdminUserRoleRelation.userID == user.ID)
+                                                       .with_entities(AdminUserRoleRelation.userID).first() is not None)
 
 
 def refreshToken():
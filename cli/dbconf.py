@@ -52,6 +52,7 @@ def cliDbconfSet(args):
             cli.print(cli.col("Key exists - aborted.", "yellow"))
             return 1
         entry.value = args.value
+    DBConf.invalidate(args.service, args.file)
     DB.session.commit()
     cli.print("{}={}".format(entry.key, entry.value or ""))
     if not args.batch:
@@ -87,6 +88,7 @@ def cliDbconfDelete(args):
     if args.key is not None:
         query = query.filter(DBConf.key == args.key)
     deleted = query.delete()
+    DBConf.invalidate(args.service, args.file)
     DB.session.commit()
     cli.print("Deleted {} entr{}".format(deleted, "y" if deleted == 1 else "ies"))
 
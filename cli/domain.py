@@ -119,7 +119,6 @@ def cliDomainDeleteRecover(args):
 def cliDomainPurge(args):
     cli = args._cli
     cli.require("DB")
-    from orm import DB
     from .common import domainCandidates
     domains = domainCandidates(args.domainspec).all()
     if len(domains) == 0:
@@ -135,9 +134,7 @@ def cliDomainPurge(args):
                        (" and all associated files" if args.files else "")+"? [y/N]: "):
             return 1
     domain.purge(deleteFiles=args.files, printStatus=True)
-    cli.print("Removing database entries...", end="")
-    DB.session.commit()
-    cli.print("Done\nDomain removed.")
+    cli.print("Domain removed.")
 
 
 def cliDomainModify(args):
@@ -44,67 +44,108 @@ def _isPrivate(args):
     return "@" in args.target
 
 
-class _FolderNode():
+class _FolderTree():
+    """Folder hierarchy stored in flat, index-based lists.
+
+    The root folder has index 0. All operations walk the tree iteratively and
+    output is written line by line, so run time and memory are linear in the
+    number of folders.
+    """
+
     I = chr(0x2502)+" "
     L = chr(0x2514)+chr(0x2500)
     T = chr(0x251c)+chr(0x2500)
 
-    def __init__(self, folder, subfolders=[]):
+    def __init__(self, root, subfolders=()):
         from tools.rop import gcToValue
-        self.ID = gcToValue(folder.folderId)
-        self.parentID = gcToValue(folder.parentId)
-        self.name = folder.displayName
-        self.subfolders = []
-        if subfolders:
-            self._buildTree(subfolders)
-
-    def _buildTree(self, subfolders):
-        subfolders = [f if isinstance(f, _FolderNode) else _FolderNode(f) for f in subfolders]
-        idmap = {sub.ID: sub for sub in subfolders}
-        idmap[self.ID] = self
-        for sub in subfolders:
-            if sub.parentID in idmap:
-                idmap[sub.parentID].subfolders.append(sub)
-
-    @property
-    def idstr(self):
-        return hex(self.ID)
-
-    def _toDict(self, recursive=True):
-        me = dict(ID=self.ID, parentID=self.parentID, name=self.name)
-        if recursive:
-            me["subfolders"] = [sf._toDict(True) for sf in self.subfolders]
-        return me
-
-    def _collectSubfolders(self):
-        sfs = list(self.subfolders)
-        for sf in self.subfolders:
-            sfs += sf._collectSubfolders()
-        return sfs
-
-    def _print_json(self, flat=False):
+        self.IDs = []
+        self.parentIDs = []
+        self.names = []
+        for folder in (root, *subfolders):
+            self.IDs.append(gcToValue(folder.folderId))
+            self.parentIDs.append(gcToValue(folder.parentId))
+            self.names.append(folder.displayName)
+        self.children = [[] for _ in self.IDs]
+        index = {ID: i for i, ID in reversed(tuple(enumerate(self.IDs)))}
+        for i in range(1, len(self.IDs)):
+            parent = index.get(self.parentIDs[i])
+            if parent is not None and parent != i:
+                self.children[parent].append(i)
+
+    def label(self, cli, i=0):
+        return "{} ({})".format(cli.col(self.names[i], attrs=["bold"]), hex(self.IDs[i]))
+
+    def walk(self):
+        """Iterate over the tree in pre-order.
+
+        Yields
+        ------
+        tuple(int, str, str)
+            Folder index, line prefix for the folder and prefix for its children
+        """
+        stack = [(0, "", "")]
+        while stack:
+            i, pref, childPref = stack.pop()
+            yield i, pref, childPref
+            children = self.children[i]
+            if children:
+                stack.append((children[-1], childPref+self.L, childPref+"  "))
+                stack.extend((child, childPref+self.T, childPref+self.I) for child in reversed(children[:-1]))
+
+    def rows(self):
+        """Iterate over (ID, parentID, name) of all folders in pre-order."""
+        return ((self.IDs[i], self.parentIDs[i], self.names[i]) for i, _, _ in self.walk())
+
+    def _dict(self, i):
         import json
-        me = self._toDict(not flat)
-        if flat:
-            me["subfolders"] = [sf._toDict(False) for sf in self._collectSubfolders()]
-        return json.dumps(me, separators=(",", ":"))
-
-    def _print_pretty(self, cli, level=-1, pref=""):
-        content = "{} ({})\n".format(cli.col(self.name, attrs=["bold"]), self.idstr)
-        if self.subfolders:
-            for sub in self.subfolders[:-1]:
-                content += pref+self.T+sub._print_pretty(cli, level+1, pref+self.I)
-            content += pref+self.L+self.subfolders[-1]._print_pretty(cli, level+1, pref+"  ")
-        return content if level >= 0 else content[:-1]
-
-    def print(self, cli, format="pretty"):
+        return '{{"ID":{},"parentID":{},"name":{}'.format(self.IDs[i], self.parentIDs[i], json.dumps(self.names[i]))
+
+    def _json_tree(self, write):
+        stack = [iter((0,))]
+        first = True
+        while stack:
+            i = next(stack[-1], None)
+            if i is None:
+                stack.pop()
+                write("]}" if stack else "")
+                first = False
+                continue
+            write(("" if first else ",")+self._dict(i)+',"subfolders":[')
+            stack.append(iter(self.children[i]))
+            first = True
+
+    def _json_flat(self, write):
+        walk = self.walk()
+        write(self._dict(next(walk)[0])+',"subfolders":[')
+        for n, (i, _, _) in enumerate(walk):
+            write(("," if n else "")+self._dict(i)+"}")
+        write("]}")
+
+    def dump(self, cli, format="pretty"):
+        """Print folder tree.
+
+        Parameters
+        ----------
+        cli : Cli
+            Cli providing printing functionality
+        format : str, optional
+            One of `csv`, `json-flat`, `json-tree`, `pretty` or `table`. The default is "pretty".
+        """
         if format in ("json-flat", "json-tree"):
-            return self._print_json(format == "json-flat")
-        return self._print_pretty(cli)
-
-    def tabledata(self):
-        sfs = self._collectSubfolders()
-        return [(self.ID, self.parentID, self.name)]+[(sf.ID, sf.parentID, sf.name) for sf in sfs]
+            write = lambda data: cli.print(data, end="")
+            self._json_flat(write) if format == "json-flat" else self._json_tree(write)
+            cli.print()
+        elif format == "csv":
+            import csv
+            writer = csv.writer(cli.stdout)
+            writer.writerow(("ID", "parentID", "name"))
+            writer.writerows(self.rows())
+        elif format == "table":
+            from .common import Table
+            Table(self.rows(), header=("ID", "parentID", "name")).print(cli)
+        else:
+            for i, pref, _ in self.walk():
+                cli.print(pref+self.label(cli, i))
 
 
 def cliExmdbFolderFind(args):
@@ -122,7 +163,7 @@ def cliExmdbFolderFind(args):
         fuzzyLevel = 0 if args.exact else 65537  # 65537 = SUBSTRING | IGNORECASE
         folders = exmdb.FolderList(client.findFolder(args.name, fid, fuzzyLevel=fuzzyLevel)).folders
         for folder in folders:
-            cli.print(_FolderNode(folder).print(cli))
+            cli.print(_FolderTree(folder).label(cli))
         cli.print(cli.col("({} result{})".format(len(folders), "" if len(folders) == 1 else "s"), attrs=["dark"]))
 
 
@@ -140,13 +181,7 @@ def cliExmdbFolderList(args):
             return ret
         root = exmdb.Folder(client.getFolderProperties(0, fid))
         subfolders = exmdb.FolderList(client.listFolders(fid, args.recursive)).folders
-        folder = _FolderNode(root, subfolders)
-        if args.format in ("csv", "table"):
-            from .common import Table
-            Table(folder.tabledata(), header=("ID", "parentID", "name"), colsep="," if args.format == "csv" else "  ")\
-                .dump(cli, args.format)
-        else:
-            cli.print(folder.print(cli, args.format))
+        _FolderTree(root, subfolders).dump(cli, args.format)
 
 
 def _cliExmdbFolderPermissionPrint(cli, permission):
@@ -183,7 +218,7 @@ def cliExmdbFolderPermissionsModify(args):
         mode = client.REMOVE if args.revoke else client.ADD
         perms = [client.setFolderMember(fid, args.username, perms, mode) for fid in fids]
         cli.print("New permissions for user '{}':".format(cli.col(args.username, attrs=["bold"])))
-        Table([(_FolderNode(folder).print(cli), _cliExmdbFolderPermissionPrint(cli, perm))
+        Table([(_FolderTree(folder).label(cli), _cliExmdbFolderPermissionPrint(cli, perm))
                for folder, perm in zip(folders, perms)]).print(cli)
 
 
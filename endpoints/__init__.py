@@ -6,6 +6,7 @@ __all__ = ["domain", "system", "defaults", "misc", "service", "tasq"]
 
 from flask import request, jsonify
 from orm import DB
+from tools.config import Config
 from tools.DataModel import MissingRequiredAttributeError, InvalidAttributeError, MismatchROError
 from tools.misc import damerau_levenshtein_distance as dldist
 import re
@@ -84,7 +85,10 @@ def defaultListQuery(Model, filters=(), order=None, result="response", automatch
         objects = [so[1] for so in sorted(scored, key=lambda entry: entry[0])]
     if result == "list":
         return objects
-    data = [obj.todict(verbosity) for obj in objects]
+    Model.prefetch(objects, verbosity)
+    with DB.stats.expect(0, "Serialization of {} {} objects".format(len(objects), Model.__name__),
+                         Config["DB"].get("lazyloadCheck")):
+        data = [obj.todict(verbosity) for obj in objects]
     if result == "data":
         return data
     resp = dict(data=data)
@@ -339,3 +343,46 @@ def defaultObjectHandler(Model, ID, name, filters=()):
         return defaultPatch(Model, ID, name, None, filters)
     elif request.method == "DELETE":
         return defaultDelete(Model, ID, name, filters)
+
+
+def defaultMembershipHandler(Model, ID, name, update, filters=()):
+    """Handle bulk membership updates.
+
+    The request body must contain a list of usernames. Depending on the request method,
+    the users are added (POST), removed (DELETE) or replace the current members (PUT).
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model of the owning object.
+    ID : int
+        ID of the owning object.
+    name : str
+        Object name to use in messages.
+    update : function
+        Function performing the update. Called with the object and `add`, `remove` or `replace` keyword argument.
+    filters : Iterable, optional
+        Additional filters for the object query. The default is ().
+
+    Returns
+    -------
+    Response
+        Flask response containing number of added and removed members or error message.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or any(not isinstance(username, str) for username in data):
+        return jsonify(message="Invalid data: expected list of usernames"), 400
+    obj = Model.query.filter(Model.ID == ID, *filters).first()
+    if obj is None:
+        return jsonify(message=name+" not found"), 404
+    mode = {"POST": "add", "DELETE": "remove", "PUT": "replace"}[request.method]
+    try:
+        added, removed = update(obj, **{mode: data})
+        DB.session.commit()
+    except ValueError as err:
+        DB.session.rollback()
+        return jsonify(message=err.args[0]), 400
+    except IntegrityError as err:
+        DB.session.rollback()
+        return jsonify(message="Could not update: invalid data", error=err.orig.args[1]), 400
+    return jsonify(added=added, removed=removed)
@@ -12,9 +12,7 @@ from tools.classfilters import ClassFilter
 from tools.constants import PropTags
 from tools.permissions import DomainAdminPermission, DomainAdminROPermission
 
-from .. import defaultListHandler, defaultObjectHandler
-
-from orm import DB
+from .. import defaultListHandler, defaultMembershipHandler, defaultObjectHandler
 
 
 @API.route(api.BaseRoute+"/domains/<int:domainID>/classes", methods=["GET", "POST"])
@@ -36,6 +34,14 @@ def classObjectEndpoint(domainID, ID):
     return defaultObjectHandler(Classes, ID, "Class", filters=(Classes.domainID == domainID,))
 
 
+@API.route(api.BaseRoute+"/domains/<int:domainID>/classes/<int:ID>/members", methods=["POST", "PUT", "DELETE"])
+@secure(requireDB=True)
+def classMembersEndpoint(domainID, ID):
+    checkPermissions(DomainAdminPermission(domainID))
+    from orm.classes import Classes
+    return defaultMembershipHandler(Classes, ID, "Class", Classes.updateMembers, filters=(Classes.domainID == domainID,))
+
+
 @API.route(api.BaseRoute+"/domains/<int:domainID>/classes/tree", methods=["GET"])
 @secure(requireDB=True)
 def classTreeEndpoint(domainID):
@@ -66,11 +72,9 @@ def testClassFilter(domainID):
     except AttributeError:
         return jsonify(message="'{}' is not a valid property".format(expr["p"])), 400
     try:
-        cf = ClassFilter(data)
+        cf = ClassFilter(data).validate()
     except ValueError as err:
         return jsonify(message="Invalid filter: "+err.args[0]), 400
-    query = "SELECT uf.id AS id, uf.username AS username FROM (" +\
-            cf.sql("id, username, domain_id") +\
-            ") AS uf WHERE uf.domain_id = :domainID"
-    res = DB.session.execute(query, params={"domainID": domainID}).fetchall()
-    return jsonify(data=[{"ID": u.id, "username": u.username} for u in res])
+    from orm.users import Users
+    res = cf.query(Users.ID, Users.username).filter(Users.domainID == domainID).all()
+    return jsonify(data=[{"ID": u.ID, "username": u.username} for u in res])
@@ -11,6 +11,7 @@ from flask import request, jsonify
 from services import Service
 
 from tools.constants import Permissions, PropTags, ExchangeErrors, PublicFIDs
+from tools.folders import FolderCache
 from tools.permissions import DomainAdminPermission, DomainAdminROPermission
 from tools.rop import nxTime, makeEidEx
 from tools.tasq import TasQServer
@@ -29,24 +30,12 @@ def getPublicFoldersList(domainID):
     limit = int(request.args.get("limit", 50))
     offset = int(request.args.get("offset", 0))
     parent = int(request.args.get("parentID", makeEidEx(1, PublicFIDs.IPMSUBTREE)))
-    with Service("exmdb") as exmdb:
-        if "match" in request.args:
-            fuzzyLevel = exmdb.Restriction.FL_SUBSTRING | exmdb.Restriction.FL_IGNORECASE
-            match = request.args["match"]
-            restriction = exmdb.Restriction.OR([
-                exmdb.Restriction.CONTENT(fuzzyLevel, 0, exmdb.TaggedPropval(PropTags.DISPLAYNAME, match)),
-                exmdb.Restriction.CONTENT(fuzzyLevel, 0, exmdb.TaggedPropval(PropTags.COMMENT, match))])
-        else:
-            restriction = exmdb.Restriction.NULL()
-        client = exmdb.domain(domain)
-        response = exmdb.FolderList(client.listFolders(parent, limit=limit, offset=offset, restriction=restriction))
-    folders = [{"folderid": str(entry.folderId),
-                "displayname": entry.displayName,
-                "comment": entry.comment,
-                "creationtime": datetime.fromtimestamp(nxTime(entry.creationTime)).strftime("%Y-%m-%d %H:%M:%S"),
-                "container": entry.container}
-               for entry in response.folders]
-    return jsonify(data=folders)
+    try:
+        folders, cursor = FolderCache.list(domain, parent, limit, offset, request.args.get("cursor"),
+                                           request.args.get("match"))
+    except ValueError as err:
+        return jsonify(message=err.args[0]), 400
+    return jsonify(data=folders, cursor=cursor)
 
 
 @API.route(api.BaseRoute+"/domains/<int:domainID>/folders", methods=["POST"])
@@ -62,6 +51,7 @@ def createPublicFolder(domainID):
     with Service("exmdb") as exmdb:
         client = exmdb.domain(domain)
         folderId = client.createFolder(domain.ID, data["displayname"], data["container"], data["comment"], parentID)
+    FolderCache.invalidate(domain.homedir)
     if folderId == 0:
         return jsonify(message="Folder creation failed"), 500
     return jsonify(folderid=str(folderId),
@@ -105,6 +95,7 @@ def updatePublicFolder(domainID, folderID):
             return jsonify(message="Nothing to do")
         client = exmdb.domain(domain)
         problems = client.setFolderProperties(0, folderID, proptags)
+        FolderCache.invalidate(domain.homedir)
         if len(problems):
             errors = ["{} ({})".format(PropTags.lookup(problem.proptag, hex(problem.proptag)).lower(),
                                        ExchangeErrors.lookup(problem.err, hex(problem.err))) for problem in problems]
@@ -123,6 +114,7 @@ def deletePublicFolder(domainID, folderID):
         return jsonify(message="Domain not found"), 404
     task = TasQServer.mktask.deleteFolder(domain.homedir, folderID, False, request.args.get("clear") == "true",
                                           DomainAdminROPermission(domainID), domain.homeserver)
+    FolderCache.invalidate(domain.homedir)
     timeout = float(request.args.get("timeout", 1))
     if timeout > 0:
         TasQServer.wait(task.ID, timeout)
@@ -8,7 +8,7 @@ from api.security import checkPermissions
 
 from flask import request, jsonify
 
-from .. import defaultListHandler, defaultObjectHandler
+from .. import defaultListHandler, defaultMembershipHandler, defaultObjectHandler
 
 from tools.permissions import DomainAdminPermission, DomainAdminROPermission
 
@@ -52,3 +52,13 @@ def mlistDeleteEndpoint(domainID, ID):
     mlist.delete()
     DB.session.commit()
     return jsonify(message="Mailing list deleted")
+
+
+@API.route(api.BaseRoute+"/domains/<int:domainID>/mlists/<int:ID>/<any(associations, specifieds):attr>",
+           methods=["POST", "PUT", "DELETE"])
+@secure(requireDB=True)
+def mlistMembersEndpoint(domainID, ID, attr):
+    checkPermissions(DomainAdminPermission(domainID))
+    from orm.mlists import MLists
+    return defaultMembershipHandler(MLists, ID, "Mailing list", lambda mlist, **kwargs: mlist.updateMembers(attr, **kwargs),
+                                    filters=(MLists.domainID == domainID,))
@@ -44,7 +44,10 @@ def getUsers(domainID):
             up = aliased(UserProperties)
             query = query.join(up, (up.userID == Users.ID) & (up.tag == getattr(PropTags, sprop.upper())))\
                          .order_by(up._propvalstr.desc() if sorder == "desc" else up._propvalstr.asc())
-    data = [user.todict(verbosity) for user in query.limit(limit).offset(offset).all()]
+    users = query.limit(limit).offset(offset).all()
+    Users.prefetch(users, verbosity)
+    with DB.stats.expect(0, "Serialization of {} Users objects".format(len(users)), Config["DB"].get("lazyloadCheck")):
+        data = [user.todict(verbosity) for user in users]
     if verbosity < 2 and "properties" in request.args:
         tags = [getattr(PropTags, prop.upper(), None) for prop in request.args["properties"].split(",")]
         for user in data:
@@ -42,6 +42,7 @@ def renameDbconfService(service):
     if data is None or "name" not in data:
         return jsonify(message="Missing or incomplete data"), 400
     count = DBConf.query.filter(DBConf.service == service).update({DBConf.service: data["name"]})
+    DBConf.invalidate(service)
     if count == 0:
         DB.session.rollback()
         return jsonify(message="Service not found"), 404
@@ -55,6 +56,7 @@ def deleteDbconfService(service):
     checkPermissions(SystemAdminPermission())
     from orm.misc import DBConf
     count = DBConf.query.filter(DBConf.service == service).delete()
+    DBConf.invalidate(service)
     if count == 0:
         DB.session.rollback()
         return jsonify(message="Service not found"), 404
@@ -79,8 +81,10 @@ def updateDbconfFile(service, file):
             for entry in existing:
                 entry.value = conf.pop(entry.key)
         DB.session.add_all(DBConf(service=service, file=file, key=key, value=value) for key, value in conf.items())
+    DBConf.invalidate(service, file)
     if "name" in data:
         count = DBConf.query.filter(DBConf.service == service, DBConf.file == file).update({DBConf.file: data["name"]})
+        DBConf.invalidate(service, data["name"])
         if count == 0:
             DB.session.rollback()
             return jsonify(message="File not found"), 404
@@ -97,6 +101,7 @@ def deleteDbconfFile(service, file):
     checkPermissions(SystemAdminPermission())
     from orm.misc import DBConf
     count = DBConf.query.filter(DBConf.service == service, DBConf.file == file).delete()
+    DBConf.invalidate(service, file)
     if count == 0:
         return jsonify(message="File not found"), 404
     DB.session.commit()
@@ -13,6 +13,7 @@ from api.security import checkPermissions
 
 from tools.permissions import SystemAdminPermission, SystemAdminROPermission
 from tools.permissions import DomainAdminROPermission, OrgAdminPermission, DomainPurgePermission
+from tools.tasq import TasQServer
 
 from orm import DB
 
@@ -114,8 +115,16 @@ def deleteDomain(domainID):
     checkPermissions(OrgAdminPermission(domain.orgID))
     if request.args.get("purge") == "true":
         checkPermissions(DomainPurgePermission())
-        domain.purge(request.args.get("deleteFiles") == "true")
-        msg = "removed."
+        task = TasQServer.mktask.domainPurge(domainID, request.args.get("deleteFiles") == "true",
+                                             SystemAdminROPermission())
+        timeout = float(request.args.get("timeout", 1))
+        if timeout > 0:
+            TasQServer.wait(task.ID, timeout)
+        if not task.done:
+            return jsonify(message="Created background task #"+str(task.ID), taskID=task.ID), 202
+        if task.state == task.COMPLETED:
+            return jsonify(message="Domain removed.")
+        return jsonify(message="Domain purge failed: "+task.message), 500
     else:
         domain.delete()
         msg = "marked as deleted."
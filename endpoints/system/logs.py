@@ -30,4 +30,16 @@ def getLog(file):
     n = int(request.args.get("n", 10))
     skip = int(request.args.get("skip", 0))
     after = datetime.strptime(request.args["after"], "%Y-%m-%d %H:%M:%S.%f") if "after" in request.args else None
-    return jsonify(data=LogReader.tail(log.get("format", "journald"), log["source"], n, skip, after))
+    level = int(request.args["level"]) if "level" in request.args else None
+    wait = float(request.args.get("wait", 0))
+    if wait:
+        from orm import DB
+        if DB is not None:
+            DB.session.remove()
+    try:
+        data, cursor = LogReader.tail(log.get("format", "journald"), log["source"], n, skip, after,
+                                      cursor=request.args.get("cursor"), level=level, search=request.args.get("search"),
+                                      wait=wait)
+    except ValueError as err:
+        return jsonify(message=" - ".join(str(arg) for arg in err.args)), 400
+    return jsonify(data=data, cursor=cursor)
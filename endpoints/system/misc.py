@@ -16,15 +16,10 @@ from tools.config import Config
 from tools.license import getLicense, updateCertificate
 from tools.permissions import SystemAdminPermission, SystemAdminROPermission
 
-import json
-import os
-import psutil
 import requests
 import shlex
 import subprocess
-import time
 
-from datetime import datetime
 from flask import jsonify, make_response, request
 from io import StringIO
 
@@ -33,47 +28,19 @@ from io import StringIO
 @secure()
 def getDashboard():
     checkPermissions(SystemAdminROPermission())
-    disks = []
-    for disk in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(disk.mountpoint)
-            stat = {"percent": usage.percent, "total": usage.total, "used": usage.used, "free": usage.free}
-            stat["device"] = disk.device
-            stat["mountpoint"] = disk.mountpoint
-            stat["filesystem"] = disk.fstype
-            disks.append(stat)
-        except:
-            pass
-    cpu = psutil.cpu_times_percent()
-    cpuPercent = dict(user=cpu.user, system=cpu.system, io=cpu.iowait, interrupt=cpu.irq+cpu.softirq, steal=cpu.steal,
-                      idle=cpu.idle)
-    vm = psutil.virtual_memory()
-    memory = dict(percent=vm.percent, total=vm.total, used=vm.used, buffer=vm.buffers, cache=vm.cached, free=vm.free,
-                  available=vm.available)
-    sm = psutil.swap_memory()
-    swap = dict(percent=sm.percent, total=sm.total, used=sm.used, free=sm.free)
-    return jsonify(disks=disks,
-                   load=os.getloadavg(),
-                   cpuPercent=cpuPercent,
-                   memory=memory,
-                   swap=swap,
-                   booted=datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S"))
+    from tools.dashboard import Sampler
+    data = dict(Sampler.get())
+    data.pop("services", None)
+    data.pop("timestamp", None)
+    return jsonify(data)
 
 
 @API.route(api.BaseRoute+"/system/dashboard/services", methods=["GET"])
 @secure()
 def getDashboardServices():
     checkPermissions(SystemAdminROPermission())
-    known = Config["options"]["dashboard"]["services"]
-    if len(known) == 0:
-        return jsonify(services=[])
-    with Service("systemd") as sysd:
-        units = sysd.getServices(*(service["unit"] for service in known))
-        for service in known:
-            if service["unit"] not in units:
-                continue
-            units[service["unit"]]["name"] = service.get("name", service["unit"].replace(".service", ""))
-        return jsonify(services=list(units.values()))
+    from tools.dashboard import Sampler
+    return jsonify(services=Sampler.get()["services"])
 
 
 @API.route(api.BaseRoute+"/system/dashboard/services/<unit>", methods=["GET"])
@@ -120,6 +87,14 @@ def dumpLicense():
                    certificate="/api/v1/system/license/certificate.pem" if License.cert is not None else None)
 
 
+@API.route(api.BaseRoute+"/system/dbstats", methods=["GET"])
+@secure()
+def getDBStats():
+    checkPermissions(SystemAdminROPermission())
+    from orm import DB
+    return jsonify(DB.stats.summary())
+
+
 @API.route(api.BaseRoute+"/system/license", methods=["GET"])
 @secure()
 def getLicenseInfo():
@@ -219,32 +194,13 @@ def cliOverRest():
 @secure()
 def syncTop():
     checkPermissions(SystemAdminROPermission())
+    from tools.synctop import SyncTop
     sync = Config["sync"]
     expUpd = sync.get("topExpireUpdate", 120)
     expEnd = sync.get("topExpireEnded", 20)
     fupd = int(request.args.get("filterUpdated", expUpd))
     fend = int(request.args.get("filterEnded", expEnd))
-    now = int(time.mktime(time.localtime()))
-    with Service("redis") as r:
-        r.set(sync.get("topTimestampKey", "grommunio-sync:topenabledat"), now)
-        hdata = r.hgetall(sync.get("topdataKey", "grommunio-sync:topdata"))
-        if hdata is None:
-            return jsonify(data=[], maxUpdated=expUpd, maxEnded=expEnd)
-        data = []
-        remove = []
-        for key, value in hdata.items():
-            try:
-                value = json.loads(value)
-                if (value["ended"] != 0 and now-value["ended"] > expEnd) or \
-                   now-value["update"] > expUpd:
-                    remove.append(key)
-                elif not (value["ended"] != 0 and now-value["ended"] > fend or now-value["update"] > fupd):
-                    data.append(value)
-            except Exception as err:
-                API.logger.warning(type(err).__name__+": "+str(err.args))
-        if len(remove) > 0:
-            r.hdel(sync.get("topdataKey", "grommunio-sync:topdata"), *remove)
-    return jsonify(data=data)
+    return jsonify(data=SyncTop.get(fupd, fend), maxUpdated=expUpd, maxEnded=expEnd)
 
 
 @API.route(api.BaseRoute+"/system/mailq", methods=["GET"])
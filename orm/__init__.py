@@ -11,17 +11,195 @@ from sqlalchemy.orm import scoped_session, sessionmaker, class_mapper, Query, co
 
 from tools.config import Config
 
+from contextlib import contextmanager
+from time import monotonic, perf_counter
+
 import logging
 logger = logging.getLogger("mysql")
 
 
+class QueryStats:
+    """Query statistics collector.
+
+    Statement counts and execution times are tracked per thread, allowing to attribute them to the current request.
+    Results of completed requests can be aggregated per endpoint.
+    """
+
+    def __init__(self, keepSlowest=5):
+        """Initialize collector.
+
+        Parameters
+        ----------
+        keepSlowest : int, optional
+            Number of slowest statements to keep per request and endpoint. The default is 5.
+        """
+        import threading
+        self.keepSlowest = keepSlowest
+        self.endpoints = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def register(self, engine):
+        """Attach statistics collection to an engine.
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            Engine to monitor
+        """
+        self._pool = engine.pool
+        event.listen(engine, "before_cursor_execute", self._beforeExecute)
+        event.listen(engine, "after_cursor_execute", self._afterExecute)
+
+    def _beforeExecute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("queryStart", []).append(perf_counter())
+
+    def _afterExecute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("queryStart")
+        if not starts:
+            return
+        duration = perf_counter()-starts.pop()
+        local = self._local
+        local.count = getattr(local, "count", 0)+1
+        local.time = getattr(local, "time", 0)+duration
+        if not hasattr(local, "slowest"):
+            local.slowest = []
+        self._keep(local.slowest, (duration, statement))
+
+    def _keep(self, slowest, entry):
+        """Insert entry into list of slowest statements, discarding the fastest if the list is full."""
+        if len(slowest) < self.keepSlowest:
+            slowest.append(entry)
+        elif entry[0] > min(slowest)[0]:
+            slowest.remove(min(slowest))
+            slowest.append(entry)
+
+    @property
+    def count(self):
+        """Number of statements executed by the current thread since the last reset."""
+        return getattr(self._local, "count", 0)
+
+    @property
+    def time(self):
+        """Time (in seconds) spent executing statements in the current thread since the last reset."""
+        return getattr(self._local, "time", 0)
+
+    def reset(self):
+        """Reset statistics of the current thread."""
+        self._local.count = 0
+        self._local.time = 0
+        self._local.slowest = []
+
+    @contextmanager
+    def expect(self, maximum, description, mode="raise"):
+        """Check number of statements executed in the current thread within the context.
+
+        Can be used as query count assertion in tests or to detect unexpected (lazy) loading.
+
+        Parameters
+        ----------
+        maximum : int
+            Maximum number of statements allowed
+        description : str
+            Description of the context used in the error message
+        mode : str, optional
+            "raise" to raise an AssertionError, "log" to log a warning or None to disable the check.
+            The default is "raise".
+
+        Raises
+        ------
+        AssertionError
+            More than `maximum` statements were executed and mode is "raise".
+        """
+        if mode is None:
+            yield
+            return
+        start = self.count
+        yield
+        executed = self.count-start
+        if executed <= maximum:
+            return
+        message = "{}: {} statement{} executed, expected at most {}".format(description, executed,
+                                                                           "" if executed == 1 else "s", maximum)
+        if mode == "raise":
+            raise AssertionError(message)
+        logger.warning(message)
+
+    def record(self, endpoint):
+        """Add statistics of the current thread to the endpoint aggregate.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the endpoint
+        """
+        local = self._local
+        count, time, slowest = self.count, self.time, getattr(local, "slowest", [])
+        with self._lock:
+            if endpoint not in self.endpoints:
+                self.endpoints[endpoint] = {"requests": 0, "queries": 0, "time": 0, "maxQueries": 0, "maxTime": 0,
+                                            "slowest": []}
+            stats = self.endpoints[endpoint]
+            stats["requests"] += 1
+            stats["queries"] += count
+            stats["time"] += time
+            stats["maxQueries"] = max(stats["maxQueries"], count)
+            stats["maxTime"] = max(stats["maxTime"], time)
+            for entry in slowest:
+                self._keep(stats["slowest"], entry)
+
+    def summary(self):
+        """Get aggregated statistics.
+
+        Returns
+        -------
+        dict
+            Pool status and per-endpoint statistics. Times are given in milliseconds.
+        """
+        with self._lock:
+            endpoints = [{"endpoint": endpoint,
+                          "requests": stats["requests"],
+                          "queries": stats["queries"],
+                          "time": round(1000*stats["time"], 3),
+                          "maxQueries": stats["maxQueries"],
+                          "maxTime": round(1000*stats["maxTime"], 3),
+                          "slowest": [{"time": round(1000*duration, 3), "statement": statement}
+                                      for duration, statement in sorted(stats["slowest"], reverse=True)]}
+                         for endpoint, stats in self.endpoints.items()]
+        pool = {}
+        if self._pool is not None and hasattr(self._pool, "checkedout"):
+            pool = {"size": self._pool.size(), "checkedIn": self._pool.checkedin(),
+                    "checkedOut": self._pool.checkedout(), "overflow": self._pool.overflow()}
+        return {"pool": pool, "endpoints": endpoints}
+
+
+def _engineOptions():
+    """Get engine parameters from configuration.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for `create_engine`
+    """
+    options = {"pool_recycle": Config["DB"]["sessionTimout"]}
+    for key, option in (("poolSize", "pool_size"), ("poolMaxOverflow", "max_overflow"), ("poolTimeout", "pool_timeout"),
+                        ("poolPrePing", "pool_pre_ping")):
+        if Config["DB"].get(key) is not None:
+            options[option] = Config["DB"][key]
+    return options
+
+
 class DBConn:
     def __init__(self, URI):
         import threading
-        self.engine = create_engine(URI, pool_recycle=Config["DB"]["sessionTimout"])
+        self.engine = create_engine(URI, **_engineOptions())
         self.session = scoped_session(sessionmaker(self.engine), threading.get_ident)
+        self.stats = QueryStats()
+        self.stats.register(self.engine)
         self.__version = None
         self.__maxversion = 0
+        self.__lastcheck = 0
         self.initVersion()
 
     def __reinit(self):
@@ -42,6 +220,20 @@ class DBConn:
         def removeSession(*args, **kwargs):
             self.session.remove()
 
+        @API.before_request
+        def resetStats():
+            self.stats.reset()
+
+        @API.after_request
+        def recordStats(response):
+            from flask import request
+            if request.endpoint is None:
+                return response
+            self.stats.record(request.endpoint)
+            if API.debug or Config["DB"].get("statsHeader"):
+                response.headers["X-DB-Stats"] = "queries={}; time={:.1f}ms".format(self.stats.count, 1000*self.stats.time)
+            return response
+
     def testConnection(self, verbose=False):
         try:
             self.session.execute("SELECT 1 FROM DUAL")
@@ -74,20 +266,28 @@ class DBConn:
 
     def initVersion(self):
         self.__version = self._fetchVersion(True)
+        self.__lastcheck = monotonic()
         self.__reinit()
 
     def requireReload(self):
         """Check if a schema version update is available.
 
         Only queries the database if current version is undefined or is lower
-        than the highest known version (i.e. an update would have an actual effect).
+        than the highest known version (i.e. an update would have an actual effect)
+        and the last check is at least `DB.versionCheckInterval` seconds ago.
 
         Returns
         -------
         bool
             Whether an update is available and the schema should be reloaded
         """
-        return (self.__version is None or self.__version < self.__maxversion) and self._fetchVersion(False) != self.__version
+        if self.__version is not None and self.__version >= self.__maxversion:
+            return False
+        now = monotonic()
+        if now-self.__lastcheck < Config["DB"].get("versionCheckInterval", 60):
+            return False
+        self.__lastcheck = now
+        return self._fetchVersion(False) != self.__version
 
     @property
     def version(self):
@@ -257,3 +457,50 @@ class NotifyTable:
         cls.__active = state
         if clear:
             cls.NTclear()
+
+
+def updateMembership(Model, owner, ownerID, add=(), remove=(), replace=None):
+    """Bulk update a username based membership table.
+
+    Membership changes are applied with set based statements instead of
+    loading and flushing individual ORM objects.
+    Usernames already present are not added again, absent usernames are
+    silently ignored on removal.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model
+        Membership model with `username` column
+    owner : str
+        Name of the attribute referencing the owning object
+    ownerID : int
+        ID of the owning object
+    add : Iterable, optional
+        Usernames to add. The default is ().
+    remove : Iterable, optional
+        Usernames to remove. The default is ().
+    replace : Iterable, optional
+        Complete list of members. If given, `add` and `remove` are ignored. The default is None.
+
+    Returns
+    -------
+    tuple(int, int)
+        Number of added and removed members
+    """
+    ownerCol = getattr(Model, owner)
+    if replace is not None:
+        add = set(replace)
+        current = {entry.username for entry in Model.query.filter(ownerCol == ownerID).with_entities(Model.username)}
+        remove = current-add
+        add -= current
+    else:
+        remove = set(remove)
+        add = set(add)-remove
+        if add:
+            add -= {entry.username for entry in Model.query.filter(ownerCol == ownerID, Model.username.in_(add))
+                                                                 .with_entities(Model.username)}
+    removed = Model.query.filter(ownerCol == ownerID, Model.username.in_(remove)).delete(synchronize_session=False)\
+        if remove else 0
+    if add:
+        DB.session.bulk_insert_mappings(Model, [{"username": username, owner: ownerID} for username in add])
+    return len(add), removed
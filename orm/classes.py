@@ -5,14 +5,19 @@
 from . import DB
 
 from tools.classfilters import ClassFilter
+from tools.config import Config
 from tools.constants import PropTags
 from tools.DataModel import DataModel, Id, RefProp, Text
+from tools.misc import TTLCache
 
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, event, func
 from sqlalchemy.dialects.mysql import INTEGER, TEXT, VARCHAR
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.orm import relationship, selectinload, validates
 
 import json
+import threading
+
+from time import monotonic
 
 
 class Hierarchy(DataModel, DB.Base):
@@ -61,6 +66,216 @@ class Members(DataModel, DB.Base):
         return self
 
 
+class FilterMembership:
+    """Materialized membership of filter defined classes.
+
+    The members of a class are computed once and kept in memory. Afterwards,
+    only users whose username or properties changed are re-evaluated.
+    Changes made by other processes become visible after `DB.filterCacheTime` seconds.
+    """
+
+    _cache = TTLCache(Config["DB"].get("filterCacheTime", 300))
+    _dirty = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _evaluate(filters, domainID, userIDs=None):
+        from .users import Users
+        query = ClassFilter(filters).query(Users.ID, Users.username).filter(Users.domainID == domainID)
+        if userIDs is not None:
+            query = query.filter(Users.ID.in_(userIDs))
+        return query.all()
+
+    @classmethod
+    def get(cls, class_):
+        """Get members of a filter defined class.
+
+        Parameters
+        ----------
+        class_ : Classes
+            Class to expand
+
+        Returns
+        -------
+        dict
+            Mapping of user IDs to usernames
+        """
+        if class_._filters is None or class_.ID is None:
+            return {}
+        with cls._lock:
+            dirty, cls._dirty = cls._dirty, set()
+            try:
+                if dirty:
+                    cls._refresh(dirty)
+                entry = cls._cache.get(class_.ID)
+                if entry is None or entry[1] != class_._filters:
+                    members = {user.ID: user.username for user in cls._evaluate(class_._filters, class_.domainID)}
+                    entry = (class_.domainID, class_._filters, members, monotonic()+cls._cache.ttl)
+                    cls._cache[class_.ID] = entry
+            except Exception:
+                cls._dirty |= dirty
+                raise
+        return dict(entry[2])
+
+    @classmethod
+    def _refresh(cls, dirty):
+        """Re-evaluate modified users for all cached classes.
+
+        Cached memberships are replaced instead of modified and keep their original expiration time.
+        Must be called while holding the lock.
+        """
+        updated = {}
+        for classID, (domainID, filters, members, expires) in cls._cache.items():
+            matches = {user.ID: user.username for user in cls._evaluate(filters, domainID, dirty)}
+            members = {userID: username for userID, username in members.items() if userID not in dirty}
+            members.update(matches)
+            updated[classID] = (domainID, filters, members, expires)
+        for classID, entry in updated.items():
+            cls._cache.set(classID, entry, entry[3]-monotonic())
+
+    @staticmethod
+    def touch(userID):
+        """Mark user for re-evaluation after the current transaction is committed."""
+        DB.session().info.setdefault("classFilterDirty", set()).add(userID)
+
+    @classmethod
+    def _afterCommit(cls, session):
+        dirty = session.info.pop("classFilterDirty", None)
+        if dirty:
+            with cls._lock:
+                cls._dirty |= dirty
+
+    @staticmethod
+    def _afterRollback(session):
+        session.info.pop("classFilterDirty", None)
+
+
+class ClassHierarchy:
+    """Cached transitive closure of the class hierarchy.
+
+    The hierarchy of a domain is loaded with a single query and expanded into a
+    mapping of each class to its descendants (with their minimal depth).
+    The cache is dropped whenever a transaction modifying the hierarchy is committed
+    and expires after `DB.hierarchyCacheTime` seconds to pick up changes made by other processes.
+    Consistency checks verify the cached hierarchy against a fingerprint (number and highest ID of relations)
+    read from the database before using it.
+    """
+
+    _cache = TTLCache(Config["DB"].get("hierarchyCacheTime", 300))
+
+    @staticmethod
+    def _query(domainID):
+        return Hierarchy.query.join(Classes, Hierarchy.classID == Classes.ID)\
+                              .filter(Hierarchy.classID != 0, Classes.domainID == domainID)
+
+    @staticmethod
+    def _version(domainID):
+        return tuple(ClassHierarchy._query(domainID).with_entities(func.count(Hierarchy.ID), func.max(Hierarchy.ID)).one())
+
+    @staticmethod
+    def _get(domainID, verify=False):
+        """Get cache entry of a domain.
+
+        Entries loaded while the current transaction contains uncommitted hierarchy changes are not cached.
+
+        Parameters
+        ----------
+        domainID : int
+            ID of the domain
+        verify : bool, optional
+            Check whether the cached entry is still up to date. The default is False.
+
+        Returns
+        -------
+        dict
+            Cache entry containing `version`, `edges` and lazily computed `closure`
+        """
+        entry = ClassHierarchy._cache.get(domainID)
+        if entry is not None and not verify:
+            return entry
+        version = ClassHierarchy._version(domainID)
+        if entry is not None and entry["version"] == version:
+            return entry
+        edges = ClassHierarchy._query(domainID).with_entities(Hierarchy.classID, Hierarchy.childID).all()
+        entry = {"version": version, "edges": [(edge.classID, edge.childID) for edge in edges], "closure": None}
+        if not DB.session().info.get("classHierarchyDirty"):
+            ClassHierarchy._cache[domainID] = entry
+        return entry
+
+    @staticmethod
+    def edges(domainID):
+        """Get all (parent, child) relations of a domain.
+
+        Parameters
+        ----------
+        domainID : int
+            ID of the domain
+
+        Returns
+        -------
+        list
+            List of (parent ID, child ID) tuples
+        """
+        return ClassHierarchy._get(domainID)["edges"]
+
+    @staticmethod
+    def _expand(edges):
+        children = {}
+        for parent, child in edges:
+            children.setdefault(parent, set()).add(child)
+        closure = {}
+        for root in children:
+            depths = {}
+            level, depth = children[root], 1
+            while level:
+                level = {ID for ID in level if ID not in depths}
+                depths.update((ID, depth) for ID in level)
+                level = {child for ID in level for child in children.get(ID, ())}
+                depth += 1
+            closure[root] = depths
+        return closure
+
+    @staticmethod
+    def closure(domainID, verify=False):
+        """Get transitive closure of the domain's class hierarchy.
+
+        Includes relations that are pending in the current session.
+
+        Parameters
+        ----------
+        domainID : int
+            ID of the domain
+        verify : bool, optional
+            Check whether the cached hierarchy is still up to date. The default is False.
+
+        Returns
+        -------
+        dict
+            Mapping of class IDs to dicts mapping descendant IDs to their depth
+        """
+        entry = ClassHierarchy._get(domainID, verify)
+        pending = [(h.classID, h.childID) for h in DB.session.new if isinstance(h, Hierarchy) and h.classID]
+        if pending:
+            return ClassHierarchy._expand(entry["edges"]+pending)
+        if entry["closure"] is None:
+            entry["closure"] = ClassHierarchy._expand(entry["edges"])
+        return entry["closure"]
+
+    @staticmethod
+    def touch(*args):
+        """Drop cache after the current transaction is committed."""
+        DB.session().info["classHierarchyDirty"] = True
+
+    @staticmethod
+    def _afterCommit(session):
+        if session.info.pop("classHierarchyDirty", False):
+            ClassHierarchy._cache.clear()
+
+    @staticmethod
+    def _afterRollback(session):
+        session.info.pop("classHierarchyDirty", None)
+
+
 class Classes(DataModel, DB.Base):
     __tablename__ = "classes"
 
@@ -85,10 +300,12 @@ class Classes(DataModel, DB.Base):
 
     _dictmapping_ = ((Id(), Text("classname", flags="patch")),
                      (Text("listname"),),
-                     (RefProp("cParents", alias="parentClasses", link="classID", flat="cParent"),
-                      RefProp("members", flags="patch, managed", link="username", flat="username"),
-                      RefProp("children", flat="child"),
-                      {"attr": "filters", "flags": "patch"}))
+                     (RefProp("cParents", alias="parentClasses", link="classID", flat="cParent",
+                              qopt=lambda rel: selectinload(rel).joinedload(Hierarchy.cParent)),
+                      RefProp("members", flags="patch, managed", link="username", flat="username", qopt=selectinload),
+                      RefProp("children", flat="child", qopt=lambda rel: selectinload(rel).joinedload(Hierarchy.child)),
+                      {"attr": "filters", "flags": "patch"},
+                      {"attr": "filterMembers"}))
 
     filterColumns = {"username"}
 
@@ -120,17 +337,7 @@ class Classes(DataModel, DB.Base):
             return False
         if base.ID == targetID:
             return True
-        new = {targetID}
-        collected = set()
-        while len(new) != 0:
-            parents = Hierarchy.query.filter(Hierarchy.childID.in_(new), Hierarchy.classID != 0)\
-                                     .with_entities(Hierarchy.classID).all()
-            new = {h.classID for h in parents}
-            new -= collected
-            collected |= new
-            if base.ID in new:
-                return True
-        return False
+        return targetID in ClassHierarchy.closure(base.domainID, verify=True).get(base.ID, ())
 
     @validates("cParents")
     def validateParentClass(self, key, h, *args):
@@ -145,17 +352,45 @@ class Classes(DataModel, DB.Base):
 
     @staticmethod
     def refTree(domainID):
-        hierarchy = Hierarchy.query.join(Classes, Hierarchy.classID == Classes.ID)\
-                                   .filter(Hierarchy.classID != 0, Classes.domainID == domainID)\
-                                   .with_entities(Hierarchy.classID, Hierarchy.childID).all()
+        hierarchy = ClassHierarchy.edges(domainID)
         classes = Classes.query.filter(Classes.domainID == domainID).with_entities(Classes.ID, Classes.classname).all()
         classMap = {c.ID: {"ID": c.ID, "name": c.classname, "children": []} for c in classes}
         toplevel = dict(classMap)
-        for h in hierarchy:
-            classMap[h.classID]["children"].append(classMap[h.childID])
-            toplevel.pop(h.childID, None)
+        for parentID, childID in hierarchy:
+            if parentID not in classMap or childID not in classMap:
+                continue
+            classMap[parentID]["children"].append(classMap[childID])
+            toplevel.pop(childID, None)
         return list(toplevel.values())
 
+    def updateMembers(self, add=(), remove=(), replace=None):
+        """Bulk update explicit class members.
+
+        Parameters
+        ----------
+        add : Iterable, optional
+            Usernames to add. The default is ().
+        remove : Iterable, optional
+            Usernames to remove. The default is ().
+        replace : Iterable, optional
+            Complete list of usernames. If given, `add` and `remove` are ignored. The default is None.
+
+        Returns
+        -------
+        tuple(int, int)
+            Number of added and removed members
+
+        Raises
+        ------
+        ValueError
+            Class is filter defined
+        """
+        from . import updateMembership
+        self.validateMembers("members", None)
+        result = updateMembership(Members, "classID", self.ID, add, remove, replace)
+        DB.session.expire(self, ["members"])
+        return result
+
     @validates("members")
     def validateMembers(self, key, member, *args):
         if self._filters is not None:
@@ -190,7 +425,27 @@ class Classes(DataModel, DB.Base):
                         raise ValueError("Invalid property '{}'".format(expr["prop"]))
 
 
-        ClassFilter(data)
+        ClassFilter(data).validate()
         self._filters = json.dumps(data, separators=(",", ":"))
 
-from . import domains, mlists
+    @property
+    def filterMembers(self):
+        return sorted(FilterMembership.get(self).values())
+
+    @classmethod
+    def prefetch(cls, objects, spec):
+        """Materialize membership of filter defined classes before serialization."""
+        if cls.inSpec(spec, "filterMembers"):
+            for class_ in objects:
+                FilterMembership.get(class_)
+
+from . import domains, mlists, users
+
+event.listen(DB.session, "after_commit", FilterMembership._afterCommit)
+event.listen(DB.session, "after_rollback", FilterMembership._afterRollback)
+event.listen(DB.session, "after_commit", ClassHierarchy._afterCommit)
+event.listen(DB.session, "after_rollback", ClassHierarchy._afterRollback)
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(users.Users, _event, lambda mapper, conn, target: FilterMembership.touch(target.ID))
+    event.listen(users.UserProperties, _event, lambda mapper, conn, target: FilterMembership.touch(target.userID))
+    event.listen(Hierarchy, _event, ClassHierarchy.touch)
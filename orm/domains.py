@@ -123,8 +123,10 @@ class Domains(DataModel, DB.Base, NotifyTable):
     def fromdict(self, patches, *args, **kwargs):
         DataModel.fromdict(self, patches, args, kwargs)
         if self.chatID:
-            with Service("chat", Service.SUPPRESS_INOP) as chat:
-                self._team = chat.updateTeam(self)
+            from tools.tasq import TasQServer
+            if TasQServer.mktask.chat("domainUpdate", ID=self.ID) is None:
+                with Service("chat", Service.SUPPRESS_INOP) as chat:
+                    self._team = chat.updateTeam(self)
 
     @property
     def syncPolicy(self):
@@ -151,6 +153,19 @@ class Domains(DataModel, DB.Base, NotifyTable):
             raise ValueError("'{}' is not a valid domain name".format(idn))
         self._domainname = idn
 
+    @classmethod
+    def prefetch(cls, objects, spec):
+        """Resolve chat teams of all objects with a bulk request."""
+        if not cls.inSpec(spec, "chat"):
+            return
+        domains = [domain for domain in objects if domain.chatID and domain._team is None]
+        if not domains:
+            return
+        with Service("chat", Service.SUPPRESS_ALL) as grochat:
+            teams = grochat.getTeams(domain.chatID for domain in domains)
+            for domain in domains:
+                domain._team = teams.get(domain.chatID)
+
     @property
     def chat(self):
         if not self.chatID:
@@ -162,12 +177,26 @@ class Domains(DataModel, DB.Base, NotifyTable):
 
     @chat.setter
     def chat(self, value):
-        if value == self.chat:
-            return
         if not DB.minVersion(79):
             raise ValueError("Cannot activate chat - please upgrade database schema to at least 79")
         if value and self.domainStatus:
             raise ValueError("Cannot activate chat for deactivated domain")
+        if not value and not self.chatID:
+            return
+        from tools.tasq import TasQServer
+        if TasQServer.mktask.chat("domainChat", ID=self.ID, value=value) is None:
+            self.syncChat(value)
+
+    def syncChat(self, value):
+        """Apply chat activation status to the chat server.
+
+        Parameters
+        ----------
+        value : bool or str
+            Whether to activate the chat team, or ID of an existing team to link.
+        """
+        if value == self.chat:
+            return
         with Service("chat") as chat:
             if isinstance(value, str):
                 tmp = chat.getTeam(value)
@@ -188,14 +217,39 @@ class Domains(DataModel, DB.Base, NotifyTable):
 
     @validates("_syncPolicy")
     def triggerSyncPolicyUpdate(self, key, value, *args):
-        if value != self._syncPolicy:
-            users = ["grommunio-sync:policycache-"+user.username
-                     for user in Users.query.with_entities(Users.username).filter(Users.domainID == self.ID)]
-            if len(users) > 0:
-                with Service("redis", Service.SUPPRESS_INOP) as r:
-                    r.delete(*users)
+        if value != self._syncPolicy and self.ID is not None:
+            from tools.tasq import TasQServer
+            if TasQServer.defer("policyCache", dict(domainID=self.ID)) is None:
+                self.clearSyncPolicyCache(self.ID)
         return value
 
+    @staticmethod
+    def clearSyncPolicyCache(domainID, chunkSize=1000):
+        """Remove cached sync policies of all users in a domain.
+
+        Keys are removed with non-blocking UNLINK commands of at most `chunkSize` keys each,
+        which are sent in a single pipeline.
+
+        Parameters
+        ----------
+        domainID : int
+            ID of the domain
+        chunkSize : int, optional
+            Maximum number of keys per command. The default is 1000.
+        """
+        users = Users.query.with_entities(Users.username).filter(Users.domainID == domainID).yield_per(chunkSize)
+        with Service("redis", Service.SUPPRESS_INOP) as r:
+            pipe = r.pipeline(transaction=False)
+            chunk = []
+            for user in users:
+                chunk.append("grommunio-sync:policycache-"+user.username)
+                if len(chunk) >= chunkSize:
+                    pipe.unlink(*chunk)
+                    chunk = []
+            if chunk:
+                pipe.unlink(*chunk)
+            pipe.execute()
+
     @staticmethod
     def checkCreateParams(data):
         if "maxUser" not in data:
@@ -215,38 +269,99 @@ class Domains(DataModel, DB.Base, NotifyTable):
                    .update({Users.addressStatus: Users.addressStatus.op("&")(0xF) + (self.NORMAL << 4)},
                            synchronize_session=False)
 
-    def purge(self, deleteFiles=False, printStatus=False):
-        from .classes import Classes, Hierarchy, Members
-        from .misc import DBConf
+    @staticmethod
+    def _purgeBatched(query, column, batchSize, progress=None, stage=None):
+        """Delete rows matching query in batches, committing after each batch.
+
+        Parameters
+        ----------
+        query : sqlalchemy.orm.Query
+            Query selecting the rows to delete
+        column : Column
+            Primary key column of the rows
+        batchSize : int
+            Maximum number of rows deleted per statement
+        progress : function, optional
+            Called with `stage`, number of deleted rows and total number of rows after each batch. The default is None.
+        stage : str, optional
+            Name of the stage reported to `progress`. The default is None.
+        """
+        total = query.count()
+        done = 0
+        while done < total:
+            IDs = [row[0] for row in query.with_entities(column).limit(batchSize).all()]
+            if not IDs:
+                break
+            column.class_.query.filter(column.in_(IDs)).delete(synchronize_session=False)
+            DB.session.commit()
+            done += len(IDs)
+            if progress:
+                progress(stage, done, total)
+
+    def purge(self, deleteFiles=False, printStatus=False, progress=None):
+        """Permanently delete domain and all associated objects.
+
+        The domain is marked as deleted first. Database entries are then removed in
+        batches of `options.purgeBatchSize` rows, each in its own transaction,
+        so tables are not locked for the whole duration of the purge.
+        Files are removed after all database entries are gone, using
+        `options.purgeWorkers` parallel threads.
+
+        Commits the session.
+
+        Parameters
+        ----------
+        deleteFiles : bool, optional
+            Delete domain and user directories. The default is False.
+        printStatus : bool, optional
+            Print progress to stdout. The default is False.
+        progress : function, optional
+            Called with stage name, number of processed and total number of items. The default is None.
+        """
+        from .classes import Classes, ClassHierarchy, Hierarchy, Members
+        from .misc import DBConf, Servers
         from .mlists import MLists, Associations, Specifieds
         from .roles import AdminRoles as AR, AdminRolePermissionRelation as ARPR
         from .users import Users, Aliases
-        users = Users.query.filter(Users.domainID == self.ID)
-        if deleteFiles:
-            from shutil import rmtree
-            us = users.with_entities(Users.maildir).all()
-            if printStatus:
-                print("Deleting user directories...", end="")
-            for user in us:
-                if user.maildir != "":
-                    rmtree(user.maildir, True)
-            if printStatus:
-                print("Done.\nDeleting domain directory...", end="")
-            rmtree(self.homedir, True)
-            if printStatus:
-                print("Done.")
-        nosync = {"synchronize_session": False}
-        classes = Classes.query.filter(Classes.domainID == self.ID).with_entities(Classes.ID)
-        Hierarchy.query.filter(Hierarchy.childID.in_(classes) | Hierarchy.classID.in_(classes)).delete(**nosync)
-        Members.query.filter(Members.classID.in_(classes)).delete(**nosync)
-        Classes.query.filter(Classes.domainID == self.ID).delete(**nosync)
-        mlists = MLists.query.filter(MLists.domainID == self.ID)
-        Specifieds.query.filter(Specifieds.listID.in_(mlists.with_entities(MLists.ID))).delete(**nosync)
-        Associations.query.filter(Associations.listID.in_(mlists.with_entities(MLists.ID))).delete(**nosync)
-        mlists.delete(**nosync)
-        Aliases.query.filter(Aliases.mainname.in_(users.with_entities(Users.username))).delete(**nosync)
-        users.delete(**nosync)
-        permissions = ARPR.query.filter(ARPR.permission == "DomainAdmin", ARPR._params == self.ID)
+        from tools.config import Config
+        from tools.tasq import TasQServer
+        if printStatus:
+            def progress(stage, done, total, report=progress):
+                print("\r{}... {}/{}".format(stage, done, total), end="\n" if done == total else "", flush=True)
+                if report:
+                    report(stage, done, total)
+        batchSize = Config["options"].get("purgeBatchSize", 1000)
+        domainID, homedir = self.ID, self.homedir
+        if self.domainStatus != self.DELETED:
+            self.delete()
+            DB.session.commit()
+
+        users = Users.query.filter(Users.domainID == domainID)
+        maildirs = [user.maildir for user in users.with_entities(Users.maildir) if user.maildir] if deleteFiles else []
+        for user in users.filter(Users.chatID != None).with_entities(Users.chatID):
+            if TasQServer.mktask.chat("userDelete", chatID=user.chatID) is None:
+                from tools.misc import GenericObject
+                with Service("chat", Service.SUPPRESS_ALL) as chat:
+                    chat.deleteUser(GenericObject(chatID=user.chatID))
+        DB.session.commit()
+
+        classes = Classes.query.filter(Classes.domainID == domainID).with_entities(Classes.ID)
+        mlists = MLists.query.filter(MLists.domainID == domainID).with_entities(MLists.ID)
+        stages = (("Removing hierarchy", Hierarchy.query.filter(Hierarchy.childID.in_(classes) |
+                                                                Hierarchy.classID.in_(classes)), Hierarchy.ID),
+                  ("Removing class members", Members.query.filter(Members.classID.in_(classes)), Members.ID),
+                  ("Removing classes", Classes.query.filter(Classes.domainID == domainID), Classes.ID),
+                  ("Removing list specifieds", Specifieds.query.filter(Specifieds.listID.in_(mlists)), Specifieds.ID),
+                  ("Removing list associations", Associations.query.filter(Associations.listID.in_(mlists)),
+                   Associations.ID),
+                  ("Removing mailing lists", MLists.query.filter(MLists.domainID == domainID), MLists.ID),
+                  ("Removing aliases", Aliases.query.filter(Aliases.mainname.in_(users.with_entities(Users.username))),
+                   Aliases.ID),
+                  ("Removing users", users, Users.ID))
+        for stage, query, column in stages:
+            self._purgeBatched(query, column, batchSize, progress, stage)
+
+        permissions = ARPR.query.filter(ARPR.permission == "DomainAdmin", ARPR._params == domainID)
         roles = []
         for permission in permissions:
             DB.session.delete(permission)
@@ -255,9 +370,22 @@ class Domains(DataModel, DB.Base, NotifyTable):
         for role in roles:
             if len(role.permissions) == 0:
                 DB.session.delete(role)
-        DBConf.query.filter(DBConf.service == "grommunio-admin", DBConf.file == "defaults-domain-"+str(self.ID))\
-                    .delete(**nosync)
+        DBConf.query.filter(DBConf.service == "grommunio-admin", DBConf.file == "defaults-domain-"+str(domainID))\
+                    .delete(synchronize_session=False)
+        DBConf.invalidate("grommunio-admin", "defaults-domain-"+str(domainID))
+        Servers.invalidate()
+        ClassHierarchy.touch()
         DB.session.delete(self)
+        DB.session.commit()
+
+        if deleteFiles:
+            from concurrent.futures import ThreadPoolExecutor
+            from shutil import rmtree
+            paths = maildirs+[homedir]
+            with ThreadPoolExecutor(Config["options"].get("purgeWorkers", 4)) as executor:
+                for done, _ in enumerate(executor.map(lambda path: rmtree(path, True), paths), 1):
+                    if progress:
+                        progress("Removing files", done, len(paths))
 
     @staticmethod
     def create(props, createRole=True, *args, **kwargs):
@@ -310,8 +438,9 @@ class Domains(DataModel, DB.Base, NotifyTable):
         if self.homeserverID and value != self.homeserverID and Config["options"].get("serverExplicitMount"):
             raise ValueError("Cannot change homeserver with explicitly mounted home-directories")
         from .misc import Servers
-        if value and Servers.query.filter(Servers.ID == value).count() == 0:
+        if value and not Servers.exists(value):
             raise ValueError("Invalid homeserver")
+        Servers.track(self.homeserverID, value, domain=True)
         return value or 0
 
     @classmethod
@@ -4,12 +4,14 @@
 
 from . import DB, logger
 
+from tools.config import Config
 from tools.DataModel import DataModel, Id, Date, Int, Text
-from tools.misc import RecursiveDict
+from tools.misc import GenericObject, RecursiveDict, TTLCache
 
-from sqlalchemy import Column, func, select
+from sqlalchemy import Column, event, func, select
 from sqlalchemy.dialects.mysql import INTEGER, TINYINT, VARCHAR, TEXT, TIMESTAMP
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import query_expression, with_expression
 
 import json
 
@@ -30,6 +32,93 @@ class DBConf(DB.Base):
     key = Column("key", VARCHAR(200), nullable=False)
     value = Column("value", VARCHAR(200), nullable=False, default="")
 
+    _cache = TTLCache(Config["DB"].get("confCacheTime", 60))
+    _generation = None
+    _generationChecked = 0
+    _generationKey = "grommunio-admin:dbconf-generation"
+
+    @staticmethod
+    def _sync():
+        """Drop cache if another node changed the configuration.
+
+        Only has an effect if `DB.confCacheSync` is enabled.
+        Redis is checked at most once per second.
+        """
+        from time import monotonic
+        if not Config["DB"].get("confCacheSync") or monotonic()-DBConf._generationChecked < 1:
+            return
+        DBConf._generationChecked = monotonic()
+        from services import Service
+        with Service("redis", Service.SUPPRESS_ALL) as r:
+            generation = r.get(DBConf._generationKey)
+            if generation != DBConf._generation:
+                DBConf._cache.clear()
+                DBConf._generation = generation
+
+    @staticmethod
+    def _getRaw(service, file):
+        """Get raw key/value mapping of a file, using the cache if possible.
+
+        Caching is only enabled with `DB.confCacheSync`, as changes made by other processes
+        (e.g. the CLI) could not be detected otherwise.
+        """
+        cached = Config["DB"].get("confCacheSync") and DBConf._cache.ttl > 0
+        if cached:
+            DBConf._sync()
+            data = DBConf._cache.get((service, file))
+            if data is not None:
+                return data
+        entries = DBConf.query.filter(DBConf.service == service, DBConf.file == file)\
+                              .with_entities(DBConf.key, DBConf.value)
+        data = {entry.key: entry.value for entry in entries}
+        if cached:
+            DBConf._cache[(service, file)] = data
+        return data
+
+    @staticmethod
+    def invalidate(service=None, file=None):
+        """Remove configuration from cache.
+
+        Entries are removed immediately and again after the current transaction is committed
+        or rolled back. If `DB.confCacheSync` is enabled, other nodes are notified on commit.
+
+        Must be called whenever the configs table is modified directly.
+
+        Parameters
+        ----------
+        service : str, optional
+            Name of the service. If omitted, the whole cache is cleared. The default is None.
+        file : str, optional
+            Name of the file. If omitted, all files are removed. The default is None.
+        """
+        key = None if service is None or file is None else (service, file)
+        DBConf._drop(key)
+        DB.session().info.setdefault("dbconfInvalid", set()).add(key)
+
+    @staticmethod
+    def _drop(key):
+        if key is None:
+            DBConf._cache.clear()
+        else:
+            DBConf._cache.pop(key)
+
+    @staticmethod
+    def _afterCommit(session):
+        keys = session.info.pop("dbconfInvalid", None)
+        if not keys:
+            return
+        for key in keys:
+            DBConf._drop(key)
+        if Config["DB"].get("confCacheSync"):
+            from services import Service
+            with Service("redis", Service.SUPPRESS_ALL) as r:
+                DBConf._generation = str(r.incr(DBConf._generationKey))
+
+    @staticmethod
+    def _afterRollback(session):
+        for key in session.info.pop("dbconfInvalid", ()):
+            DBConf._drop(key)
+
     @staticmethod
     def getFile(service, file, structured=False):
         """Read config file to dict.
@@ -50,8 +139,7 @@ class DBConf(DB.Base):
         dict
             Key/value pairs of the file
         """
-        entries = DBConf.query.filter(DBConf.service == service, DBConf.file == file).with_entities(DBConf.key, DBConf.value)
-        data = {entry.key: _trydec(entry.value, entry.value) for entry in entries}
+        data = {key: _trydec(value, value) for key, value in DBConf._getRaw(service, file).items()}
         return RecursiveDict(data) if structured else data
 
     @staticmethod
@@ -74,9 +162,7 @@ class DBConf(DB.Base):
         str
             Configuration value.
         """
-        entry = DBConf.query.filter(DBConf.service == service, DBConf.file == file, DBConf.key == key)\
-                            .with_entities(DBConf.value).first()
-        return default if entry is None else entry.value
+        return DBConf._getRaw(service, file).get(key, default)
 
     @staticmethod
     def setFile(service, file, data):
@@ -100,10 +186,15 @@ class DBConf(DB.Base):
         data = data.flat() if isinstance(data, RecursiveDict) else data
         data = {key: json.dumps(value, separators=(",", ":")) for key, value in data.items()}
         DBConf.query.filter(DBConf.service == service, DBConf.file == file).delete()
+        DBConf.invalidate(service, file)
         DB.session.bulk_insert_mappings(DBConf, [dict(service=service, file=file, key=key, value=value)
                                                  for key, value in data.items()])
 
 
+event.listen(DB.session, "after_commit", DBConf._afterCommit)
+event.listen(DB.session, "after_rollback", DBConf._afterRollback)
+
+
 class TasQ(DataModel, DB.Base):
     __tablename__ = "tasq"
 
@@ -151,13 +242,19 @@ class Servers(DataModel, DB.Base):
 
     _dictmapping_ = ((Id(), Text("hostname", flags="patch")),
                      (Text("extname", flags="patch"),),
-                     (Int("users"),
-                      Int("domains")))
+                     (Int("users", preload=lambda cls: with_expression(cls._users, cls.users)),
+                      Int("domains", preload=lambda cls: with_expression(cls._domains, cls.domains))))
+
+    # Counts loaded together with the object (see `optimize_query`)
+    _users = query_expression()
+    _domains = query_expression()
 
     # Defined as hybrid_property instead of column_property to break cyclical import dependency
     # Domains -> Users -> Servers -> Domains
     @hybrid_property
     def users(self):
+        if self._users is not None:
+            return self._users
         from .users import Users
         return Users.query.filter(Users.homeserverID == self.ID).count()
 
@@ -168,6 +265,8 @@ class Servers(DataModel, DB.Base):
 
     @hybrid_property
     def domains(self):
+        if self._domains is not None:
+            return self._domains
         from .domains import Domains
         return Domains.query.filter(Domains.homeserverID == self.ID).count()
 
@@ -176,6 +275,87 @@ class Servers(DataModel, DB.Base):
         from .domains import Domains
         return select([func.count(Domains.ID)]).where(Domains.homeserverID == cls.ID).as_scalar()
 
+    _cache = TTLCache(Config["DB"].get("confCacheTime", 60))
+
+    @staticmethod
+    def _allocation():
+        """Get cached server list and number of users and domains per server.
+
+        Returns
+        -------
+        GenericObject
+            Object containing the `servers` list (ordered by ID) and `users` and `domains` dicts
+            mapping server IDs to the number of objects stored on the server.
+        """
+        data = Servers._cache.get("allocation")
+        if data is None:
+            from .domains import Domains
+            from .users import Users
+            servers = [GenericObject(ID=server.ID, hostname=server.hostname)
+                       for server in Servers.query.with_entities(Servers.ID, Servers.hostname).order_by(Servers.ID)]
+            users = Users.query.with_entities(Users.homeserverID, func.count(Users.ID)).group_by(Users.homeserverID)
+            domains = Domains.query.with_entities(Domains.homeserverID, func.count(Domains.ID)).group_by(Domains.homeserverID)
+            data = GenericObject(servers=servers, users=dict(users.all()), domains=dict(domains.all()))
+            Servers._cache["allocation"] = data
+        return data
+
+    @staticmethod
+    def track(oldID, newID, domain=False):
+        """Record movement of a user or domain between servers.
+
+        Counters are updated when the current transaction is committed.
+
+        Parameters
+        ----------
+        oldID : int
+            ID of the previous server (or 0/None for new objects)
+        newID : int
+            ID of the new server (or 0/None for deleted objects)
+        domain : bool, optional
+            Whether the object is a domain. The default is False.
+        """
+        if oldID == newID:
+            return
+        pending = DB.session().info.setdefault("serverAlloc", [])
+        if oldID:
+            pending.append((domain, oldID, -1))
+        if newID:
+            pending.append((domain, newID, 1))
+
+    @staticmethod
+    def invalidate():
+        """Reload server list and counters after the current transaction is committed."""
+        DB.session().info["serverAllocInvalid"] = True
+
+    @staticmethod
+    def _afterCommit(session):
+        pending = session.info.pop("serverAlloc", ())
+        if session.info.pop("serverAllocInvalid", False):
+            Servers._cache.clear()
+            return
+        data = Servers._cache.get("allocation")
+        if data is None:
+            return
+        for domain, serverID, delta in pending:
+            counts = data.domains if domain else data.users
+            counts[serverID] = counts.get(serverID, 0)+delta
+
+    @staticmethod
+    def _afterRollback(session):
+        session.info.pop("serverAlloc", None)
+        session.info.pop("serverAllocInvalid", None)
+
+    @staticmethod
+    def exists(serverID):
+        """Check whether a server exists, using the cached server list.
+
+        Unknown IDs cause the cache to be reloaded, so servers created by other processes are found immediately.
+        """
+        if any(server.ID == serverID for server in Servers._allocation().servers):
+            return True
+        Servers._cache.clear()
+        return any(server.ID == serverID for server in Servers._allocation().servers)
+
     @staticmethod
     def _getServer(objID, serverID=None, domain=False):
         """Select a server for an object
@@ -194,23 +374,27 @@ class Servers(DataModel, DB.Base):
 
         Returns
         -------
-        Servers
-            Selected server object or None if no servers are configured (i.e. single server setup)
+        GenericObject
+            ID and hostname of the selected server or None if no servers are configured (i.e. single server setup)
         """
         if not DB.minVersion(105):
             return None
-        from tools.config import Config
+        data = Servers._allocation()
         if serverID:
-            server = Servers.query.filter(Servers.ID == serverID).first()
+            server = next((server for server in data.servers if server.ID == serverID), None)
             if server is None:
                 raise ValueError("Requested server #{} not found".format(serverID))
             return server
-        servers = Servers.query.count()
+        servers = len(data.servers)
         if servers == 0:
             return None
         policy = DBConf.getValue("grommunio-admin", "multi-server", "policy", default="round-robin")
         if policy == "balanced":
-            return Servers.query.order_by((Servers.domains if domain else Servers.users).asc()).first()
+            counts = dict(data.domains if domain else data.users)
+            for isDomain, ID, delta in DB.session().info.get("serverAlloc", ()):
+                if isDomain == domain:
+                    counts[ID] = counts.get(ID, 0)+delta
+            return min(data.servers, key=lambda server: (counts.get(server.ID, 0), server.ID))
         elif policy == "first":
             index = 0
         elif policy == "last":
@@ -222,7 +406,7 @@ class Servers(DataModel, DB.Base):
             if policy != "round-robin":
                 logger.warning("Unknown multi-server policy '{}'. Defaulting to round-robin.".format(policy))
             index = objID % servers
-        return Servers.query.order_by(Servers.ID).offset(index).first()
+        return data.servers[index]
 
     @staticmethod
     def allocUser(userID, serverID=None):
@@ -271,3 +455,9 @@ class Servers(DataModel, DB.Base):
         targetPath = Config["options"]["domainPrefix"]
         targetPath = path.join(targetPath, server.hostname) if serverMount else targetPath
         return (0 if server is None else server.ID, targetPath)
+
+
+event.listen(DB.session, "after_commit", Servers._afterCommit)
+event.listen(DB.session, "after_rollback", Servers._afterRollback)
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Servers, _event, lambda *args: Servers.invalidate())
@@ -145,6 +145,50 @@ class MLists(DataModel, DB.Base):
             Classes.query.filter(Classes.listname == self.listname).update({Classes.listname: None}, synchronize_session=False)
         DB.session.delete(self)
 
+    def updateMembers(self, attr, add=(), remove=(), replace=None):
+        """Bulk update associations or sender specifications.
+
+        Parameters
+        ----------
+        attr : str
+            Either "associations" or "specifieds"
+        add : Iterable, optional
+            Usernames to add. The default is ().
+        remove : Iterable, optional
+            Usernames to remove. The default is ().
+        replace : Iterable, optional
+            Complete list of usernames. If given, `add` and `remove` are ignored. The default is None.
+
+        Returns
+        -------
+        tuple(int, int)
+            Number of added and removed entries
+
+        Raises
+        ------
+        ValueError
+            Membership cannot be changed or a user is already associated with another list
+        """
+        from . import updateMembership
+        if attr == "associations":
+            Model = Associations
+            self.validateAssociations(attr, None)
+            added = set(replace if replace is not None else add)
+            if added:
+                taken = Associations.query.filter(Associations.username.in_(added), Associations.listID != self.ID)\
+                                          .with_entities(Associations.username).all()
+                if taken:
+                    raise ValueError("Users already associated with another list: " +
+                                     ", ".join(sorted(entry.username for entry in taken)))
+        elif attr == "specifieds":
+            Model = Specifieds
+            self.validateSpecifieds(attr, None)
+        else:
+            raise ValueError("Invalid member type '{}'".format(attr))
+        result = updateMembership(Model, "listID", self.ID, add, remove, replace)
+        DB.session.expire(self, [attr])
+        return result
+
     @validates("associations")
     def validateAssociations(self, key, assoc, *args):
         if self.listType != self.TYPE_NORMAL:
@@ -6,7 +6,7 @@ import json
 
 from sqlalchemy import Column, ForeignKey
 from sqlalchemy.dialects.mysql import INTEGER, TEXT, VARCHAR
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, selectinload
 
 from tools.DataModel import DataModel, Id, Int, RefProp, Text
 
@@ -26,7 +26,8 @@ class AdminRoles(DataModel, DB.Base):
     _dictmapping_ = ((Id(), Text("name", flags="patch")),
                      (Text("description", flags="patch"),),
                      (RefProp("permissions", flags="patch, managed", link="ID"),
-                      RefProp("users", link="userID", flat="user", flags="patch")))
+                      RefProp("users", link="userID", flat="user", flags="patch",
+                              qopt=lambda rel: selectinload(rel).joinedload(AdminUserRoleRelation.user))))
 
 
 class AdminRolePermissionRelation(DataModel, DB.Base):
@@ -35,6 +35,7 @@ class Users(DataModel, DB.Base, NotifyTable):
             self.__user = user
             self.__struct = {}
             self.__dict = {}
+            self.dirty = set()
             for prop in user._properties:
                 if PropTypes.ismv(prop.tag):
                     if prop.tag in self.__struct:
@@ -69,21 +70,27 @@ class Users(DataModel, DB.Base, NotifyTable):
             if not PropTypes.ismv(tag):
                 if tag in self.__struct:
                     if v is None:
-                        DB.session.delete(self.__struct[tag])
-                    else:
+                        DB.session.delete(self.__struct.pop(tag))
+                    elif self.__struct[tag].val != v:
                         self.__struct[tag].val = v
+                    else:
+                        return
                 elif v is None:
                     return
                 else:
                     self.__struct[tag] = UserProperties(tag, v, self.__user)
                     DB.session.add(self.__struct[tag])
                 self.__dict[name] = v
+                self.dirty.add(tag)
                 return
             if v is None:
                 v = []
             elif not isinstance(v, (list, tuple, set)):
                 v = [v]
             values = self.__dict.get(name, ())
+            if list(values) == list(v):
+                return
+            self.dirty.add(tag)
             current = self.__struct.get(tag, ())
             next = []
             for value in v:
@@ -119,11 +126,12 @@ class Users(DataModel, DB.Base, NotifyTable):
             for k, v in data.items():
                 self[k] = v
 
-        def rawmap(self):
+        def rawmap(self, tags=None):
             def getv(prop):
                 return PropTypes.pyType(prop.baseType)(prop.content)
-            return {tag: [getv(p) for p in prop] if PropTypes.ismv(tag) else getv(prop)
-                    for tag, prop in self.__struct.items()}
+            props = self.__struct.items() if tags is None else \
+                ((tag, self.__struct[tag]) for tag in tags if tag in self.__struct)
+            return {tag: [getv(p) for p in prop] if PropTypes.ismv(tag) else getv(prop) for tag, prop in props}
 
     __tablename__ = "users"
 
@@ -173,12 +181,13 @@ class Users(DataModel, DB.Base, NotifyTable):
                       BoolP("privArchive", flags="patch"),
                       RefProp("aliases", flags="patch, managed", link="aliasname", flat="aliasname", qopt=selectinload),
                       RefProp("fetchmail", flags="managed, patch", link="ID", qopt=selectinload),
-                      {"attr": "properties", "flags": "patch", "func": lambda p: p.namemap()},
+                      {"attr": "properties", "flags": "patch", "func": lambda p: p.namemap(),
+                       "preload": lambda cls: selectinload(cls._properties)},
                       RefProp("roles", qopt=selectinload),
                       RefProp("forward", flags="managed, patch"),
                       {"attr": "syncPolicy", "flags": "patch"},
-                      {"attr": "chat", "flags": "patch"},
-                      {"attr": "chatAdmin", "flags": "patch"},
+                      {"attr": "chat", "flags": "patch", "preload": lambda cls: selectinload(cls.domain)},
+                      {"attr": "chatAdmin", "flags": "patch", "preload": lambda cls: selectinload(cls.domain)},
                       RefProp("homeserver", "homeserverID", flags="patch", filter="set", qopt=selectinload)),
                      ({"attr": "password", "flags": "init, hidden"},
                       Text("maildir", flags="hidden"),))
@@ -216,6 +225,8 @@ class Users(DataModel, DB.Base, NotifyTable):
     DOMAIN_MASK = 0x30
 
     _chatUser = None
+    _chatAdmin = None  # Chat admin status to apply once chat is activated
+    _chatActivating = False
     _propcache = None
 
     @staticmethod
@@ -278,10 +289,12 @@ class Users(DataModel, DB.Base, NotifyTable):
         if displaytype in (0, 1, 7, 8):
             self._deprecated_addressType, self._deprecated_subType = self._decodeDisplayType(displaytype)
         if self.chatID:
-            with Service("chat", Service.SUPPRESS_INOP) as chat:
-                self._chatUser = chat.updateUser(self, False)
+            from tools.tasq import TasQServer
+            if TasQServer.mktask.chat("userUpdate", ID=self.ID) is None:
+                with Service("chat", Service.SUPPRESS_INOP) as chat:
+                    self._chatUser = chat.updateUser(self, False)
         if syncStore == "always" or (syncStore and "properties" in patches):
-            self.syncStore()
+            self.scheduleStoreSync(syncStore == "always")
 
 
     @staticmethod
@@ -503,12 +516,33 @@ class Users(DataModel, DB.Base, NotifyTable):
 
     @chat.setter
     def chat(self, value):
-        if value == self.chat:
-            return
         if not DB.minVersion(78):
             raise ValueError("Cannot activate chat - please upgrade database schema to at least 78")
         if value and self.addressStatus:
             raise ValueError("Cannot activate chat for locked user")
+        if not value and not self.chatID:
+            return
+        from tools.tasq import TasQServer
+        if TasQServer.mktask.chat("userChat", ID=self.ID, value=value) is None:
+            self.syncChat(value)
+            if self._chatAdmin is not None:
+                self.syncChatAdmin(self._chatAdmin)
+        else:
+            self._chatActivating = bool(value)
+            if value and self._chatAdmin is not None:
+                TasQServer.mktask.chat("userChatAdmin", ID=self.ID, value=self._chatAdmin)
+        self._chatAdmin = None
+
+    def syncChat(self, value):
+        """Apply chat activation status to the chat server.
+
+        Parameters
+        ----------
+        value : bool or str
+            Whether to activate the chat user, or ID of an existing chat user to link.
+        """
+        if value == self.chat:
+            return
         err_prefix = "Could not enable chat for user '{}': ".format(self.username)
         if not self.domain.chat:
             logger.warning(err_prefix+"chat is not enabled for domain")
@@ -535,13 +569,47 @@ class Users(DataModel, DB.Base, NotifyTable):
             if tmp is None:
                 logger.warning(err)
 
+    @classmethod
+    def prefetch(cls, objects, spec):
+        """Resolve chat users of all objects with a single request."""
+        if not (cls.inSpec(spec, "chat") or cls.inSpec(spec, "chatAdmin")):
+            return
+        users = [user for user in objects if user.chatID and user._chatUser is None]
+        if not users:
+            return
+        with Service("chat", Service.SUPPRESS_ALL) as chat:
+            chatUsers = chat.getUsers(user.chatID for user in users)
+            for user in users:
+                user._chatUser = chatUsers.get(user.chatID)
+        from .domains import Domains
+        Domains.prefetch(list({user.domain for user in users if user.domain is not None}), ("chat",))
+
     @property
     def chatAdmin(self):
         return self.chat and "system_admin" in self._chatUser["roles"].split(" ")
 
     @chatAdmin.setter
     def chatAdmin(self, value):
-        if not self.chat or self.chatAdmin == bool(value):
+        if not self.chatID and not self._chatActivating:
+            self._chatAdmin = bool(value)
+            return
+        from tools.tasq import TasQServer
+        if TasQServer.mktask.chat("userChatAdmin", ID=self.ID, value=bool(value)) is None:
+            self.syncChatAdmin(value)
+
+    def syncChatAdmin(self, value):
+        """Apply chat admin status to the chat server.
+
+        Parameters
+        ----------
+        value : bool
+            Whether the user should be a chat system admin.
+        """
+        if not self.chat:
+            if value:
+                logger.warning("Could not make '{}' chat admin: chat is not enabled for user".format(self.username))
+            return
+        if self.chatAdmin == bool(value):
             return
         if value:
             tmpRoles = " ".join(self._chatUser["roles"].split(" ")+["system_admin"])
@@ -566,8 +634,9 @@ class Users(DataModel, DB.Base, NotifyTable):
         if self.homeserverID and value != self.homeserverID and Config["options"].get("serverExplicitMount"):
             raise ValueError("Cannot change homeserver with explicitly mounted home-directories")
         from .misc import Servers
-        if value and Servers.query.filter(Servers.ID == value).count() == 0:
+        if value and not Servers.exists(value):
             raise ValueError("Invalid homeserver")
+        Servers.track(self.homeserverID, value)
         return value or 0
 
     @staticmethod
@@ -613,9 +682,12 @@ class Users(DataModel, DB.Base, NotifyTable):
         Members.query.filter(Members.username == self.username).delete(synchronize_session=False)
         Associations.query.filter(Associations.username == self.username).delete(synchronize_session=False)
         if self.chatID is not None:
-            from services import Service
-            with Service("chat", Service.SUPPRESS_ALL) as chat:
-                chat.deleteUser(self) if deleteChatUser else chat.activateUser(self, False)
+            from tools.tasq import TasQServer
+            if TasQServer.mktask.chat("userDelete", chatID=self.chatID, delete=deleteChatUser) is None:
+                with Service("chat", Service.SUPPRESS_ALL) as chat:
+                    chat.deleteUser(self) if deleteChatUser else chat.activateUser(self, False)
+        from .misc import Servers
+        Servers.track(self.homeserverID, None)
         DB.session.delete(self)
 
     @staticmethod
@@ -649,7 +721,7 @@ class Users(DataModel, DB.Base, NotifyTable):
                     return "Error during user setup: "+us.error, us.errorCode
                 if sync:
                     try:
-                        user.syncStore()
+                        user.syncStore(True)
                     except Exception:
                         pass
                     return user, 201
@@ -669,22 +741,117 @@ class Users(DataModel, DB.Base, NotifyTable):
         self.primaryEmail = value
         return value
 
-    def syncStore(self):
-        """Write all properties to the exmdb store.
+    def _storeProps(self, exmdb, tags=None):
+        """Collect property values to write to and tags to remove from the store.
+
+        Parameters
+        ----------
+        exmdb : services.exmdb.ExmdbService
+            Exmdb service
+        tags : Iterable, optional
+            Tags to synchronize. If None, all properties are written. The default is None.
+
+        Returns
+        -------
+        tuple(list, list)
+            List of tagged propvals to set and list of tags to remove
+        """
+        raw = self.properties.rawmap(tags)
+        props = []
+        for tag, value in raw.items():
+            try:
+                props.append(exmdb.TaggedPropval(tag, value))
+            except Exception:
+                pass
+        return props, [tag for tag in tags if tag not in raw] if tags is not None else []
 
+    @staticmethod
+    def _pushStoreProps(client, props, removed):
+        if props:
+            client.setStoreProperties(0, props)
+        if removed:
+            client.removeStoreProperties(removed)
+
+    def syncStore(self, full=False):
+        """Write properties to the exmdb store.
+
+        By default, only properties modified since the last synchronization are written.
         For users without a store, this function has no effect.
+
+        Parameters
+        ----------
+        full : bool, optional
+            Write all properties. The default is False.
         """
-        if not self.maildir:
+        tags = None if full else set(self.properties.dirty)
+        if not self.maildir or tags is not None and not tags:
             return
         with Service("exmdb") as exmdb:
-            props = []
-            for tag, value in self.properties.rawmap().items():
-                try:
-                    props.append(exmdb.TaggedPropval(tag, value))
-                except Exception:
-                    pass
-            client = exmdb.user(self)
-            client.setStoreProperties(0, props)
+            self._pushStoreProps(exmdb.user(self), *self._storeProps(exmdb, tags))
+        self.properties.dirty.clear()
+
+    def scheduleStoreSync(self, full=False):
+        """Write modified properties to the exmdb store after the current transaction is committed.
+
+        Changes of the same user made within one transaction are combined into a single store update.
+        If the TasQ server is not running, the store is updated immediately.
+
+        Parameters
+        ----------
+        full : bool, optional
+            Write all properties. The default is False.
+        """
+        from tools.tasq import TasQServer
+        tags = None if full else sorted(self.properties.dirty)
+        if not self.maildir or tags is not None and not tags:
+            return
+        if TasQServer.mktask.storeSync(self.ID, tags) is None:
+            self.syncStore(full)
+        else:
+            self.properties.dirty.clear()
+
+    @staticmethod
+    def syncStoresOptions():
+        """Get query options to load all relations used by `syncStores`.
+
+        Returns
+        -------
+        list
+            List of loader options
+        """
+        from sqlalchemy.orm import selectinload
+        return [selectinload(Users._properties)]+([selectinload(Users.homeserver)] if DB.minVersion(104) else [])
+
+    @staticmethod
+    def syncStores(users, tags=None):
+        """Write properties of multiple users to their exmdb stores.
+
+        Stores are updated concurrently (see `services.exmdb.ExmdbService.fanout`).
+        Users without a store are skipped. Users should be loaded with `syncStoresOptions`.
+
+        Parameters
+        ----------
+        users : Iterable
+            Users to synchronize
+        tags : dict, optional
+            Mapping of user IDs to tags to synchronize. Users not contained are synchronized completely,
+            users mapped to an empty collection are skipped. The default is None.
+
+        Returns
+        -------
+        dict
+            Mapping of user IDs to exceptions for stores that could not be updated
+        """
+        tags = tags or {}
+        jobs = []
+        with Service("exmdb") as exmdb:
+            for user in users:
+                userTags = tags.get(user.ID)
+                if not user.maildir or userTags is not None and not userTags:
+                    continue
+                update = user._storeProps(exmdb, userTags)
+                jobs.append((user.ID, exmdb.user(user), lambda client, update=update: Users._pushStoreProps(client, *update)))
+            return exmdb.fanout(jobs)[1]
 
 
 class UserProperties(DB.Base):
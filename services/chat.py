@@ -7,6 +7,7 @@ from . import ServiceHub, ServiceUnavailableError
 from mattermostdriver import Driver
 from mattermostdriver.exceptions import InvalidOrMissingParameters, ResourceNotFound, ContentTooLarge
 from requests.exceptions import ConnectionError, HTTPError
+from tools.misc import TTLCache
 
 import hashlib
 import random
@@ -29,6 +30,14 @@ class GrochatService:
             self.driver.login()
         except Exception as err:
             raise ServiceUnavailableError("Failed to connect to grommunio-chat", err)
+        cacheTime = Config["chat"].get("cacheTime", 10)
+        self._users = TTLCache(cacheTime, 10000)
+        self._teams = TTLCache(cacheTime, 10000)
+
+    @staticmethod
+    def _cached(cache, ID):
+        entry = cache.get(ID)
+        return None if entry is None else dict(entry)
 
     @staticmethod
     def _addif(props, data, srcname, dstname):
@@ -49,6 +58,7 @@ class GrochatService:
     def createUser(self, user):
         """Create grochat user from grommunio user."""
         if user.chatID:
+            self._users.pop(user.chatID)
             return self.driver.users.get_user(user.chatID)
         userdata = self.userToData(user)
         userdata["auth_service"] = "pam"
@@ -64,9 +74,11 @@ class GrochatService:
         if not isdata and user.chatID is None:
             return self.createUser(user) if create else None
         userdata = user if isdata else self.userToData(user)
+        self._users.pop(userdata["id"])
         return self.driver.users.patch_user(userdata["id"], userdata)
 
     def setUserRoles(self, userID, roles):
+        self._users.pop(userID)
         return self.driver.users.update_user_role(userID, {"roles": roles})
 
     def linkUser(self, user):
@@ -87,6 +99,7 @@ class GrochatService:
         """
         if not user.chatID:
             return None
+        self._users.pop(user.chatID)
         return self.driver.users.update_user_active_status(user.chatID, {"active": status})
 
     def deleteUser(self, user):
@@ -101,6 +114,7 @@ class GrochatService:
         """
         if not user.chatID:
             return None
+        self._users.pop(user.chatID)
         res = self.driver.client.make_request("delete", "/users/"+user.chatID, params={"permanent": "true"})
         if res.ok:
             user.chatID = None
@@ -109,10 +123,42 @@ class GrochatService:
     def getUser(self, userID):
         if not userID:
             return None
+        cached = self._cached(self._users, userID)
+        if cached is not None:
+            return cached
         try:
-            return self.driver.users.get_user(userID)
+            gcUser = self.driver.users.get_user(userID)
         except HTTPError:
             return None
+        self._users[userID] = gcUser
+        return dict(gcUser)
+
+    def getUsers(self, userIDs):
+        """Get multiple users with a single request.
+
+        Parameters
+        ----------
+        userIDs : Iterable of str
+            IDs of the users to retrieve
+
+        Returns
+        -------
+        dict
+            Mapping of user ID -> user data. Users that could not be found are omitted.
+        """
+        result = {}
+        missing = []
+        for userID in set(userIDs):
+            cached = self._cached(self._users, userID)
+            if cached is None:
+                missing.append(userID)
+            else:
+                result[userID] = cached
+        if missing:
+            for gcUser in self.driver.users.get_users_by_ids(missing):
+                self._users[gcUser["id"]] = gcUser
+                result[gcUser["id"]] = dict(gcUser)
+        return result
 
     def domainToData(self, domain):
         teamname = hashlib.md5(domain.domainname.encode("ascii")).hexdigest()
@@ -124,6 +170,7 @@ class GrochatService:
     def createTeam(self, domain):
         """Create team for domain."""
         if domain.chatID:
+            self._teams.pop(domain.chatID)
             return self.driver.teams.get_team(domain.chatID)
         teamdata = self.domainToData(domain)
         gcTeam = self.driver.teams.create_team(teamdata)
@@ -134,6 +181,7 @@ class GrochatService:
         """Archive a domains team."""
         if not domain.chatID:
             return None
+        self._teams.pop(domain.chatID)
         if status:
             resp = self.driver.client.make_request("post", "/teams/"+domain.chatID+"/restore")
             return resp.json() if resp.status_code == 200 else None
@@ -143,10 +191,61 @@ class GrochatService:
     def getTeam(self, teamID):
         if not teamID:
             return None
-        return self.driver.teams.get_team(teamID)
+        cached = self._cached(self._teams, teamID)
+        if cached is not None:
+            return cached
+        gcTeam = self.driver.teams.get_team(teamID)
+        self._teams[teamID] = gcTeam
+        return dict(gcTeam)
+
+    def getTeams(self, teamIDs, pageSize=200):
+        """Get multiple teams.
+
+        Teams not found in the cache are retrieved from the team list, which is read page-wise until all
+        requested teams are found. Only teams missing from the list (i.e. archived or deleted teams)
+        are requested individually.
+
+        Parameters
+        ----------
+        teamIDs : Iterable of str
+            IDs of the teams to retrieve
+        pageSize : int, optional
+            Number of teams to request at once. The default is 200.
+
+        Returns
+        -------
+        dict
+            Mapping of team ID -> team data. Teams that could not be found are omitted.
+        """
+        result = {}
+        missing = set()
+        for teamID in set(teamIDs):
+            cached = self._cached(self._teams, teamID)
+            if cached is None:
+                missing.add(teamID)
+            else:
+                result[teamID] = cached
+        page = 0
+        while missing:
+            teams = self.driver.teams.get_teams(params={"page": page, "per_page": pageSize})
+            for gcTeam in teams:
+                if gcTeam["id"] in missing:
+                    self._teams[gcTeam["id"]] = gcTeam
+                    result[gcTeam["id"]] = dict(gcTeam)
+                    missing.remove(gcTeam["id"])
+            if len(teams) < pageSize:
+                break
+            page += 1
+        for teamID in missing:
+            try:
+                result[teamID] = self.getTeam(teamID)
+            except HTTPError:
+                pass
+        return result
 
     def updateTeam(self, domain):
         if not domain.chatID:
             return None
+        self._teams.pop(domain.chatID)
         teamdata = self.domainToData(domain)
         return self.driver.teams.update_team(domain.chatID, teamdata)
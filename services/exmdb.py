@@ -10,18 +10,146 @@ def exmdbHandleException(service, error):
         return ServiceHub.UNAVAILABLE, error.args[0]
 
 
+class ConnectionPool:
+    """Pool of reusable exmdb connections.
+
+    The exmdb handshake binds a connection to the home directory it was
+    created with, so connections are kept per (host, port, homedir, isPrivate)
+    key and handed out exclusively for the duration of a single call.
+    Connections idle for longer than `idleTimeout` seconds are closed, at most
+    `maxIdle` idle connections are kept in total (evicting the oldest).
+    """
+
+    def __init__(self, factory, maxIdle=8, idleTimeout=60):
+        """Initialize pool.
+
+        Parameters
+        ----------
+        factory : function
+            Function called with host, port, homedir and isPrivate to create a new connection
+        maxIdle : int, optional
+            Maximum number of idle connections. The default is 8.
+        idleTimeout : float, optional
+            Time in seconds after which idle connections are discarded. The default is 60.
+        """
+        import threading
+        self.factory = factory
+        self.maxIdle = maxIdle
+        self.idleTimeout = idleTimeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host, port, homedir, isPrivate):
+        """Get a connection.
+
+        Parameters
+        ----------
+        host : str
+            Host to connect to
+        port : str
+            Port to connect to
+        homedir : str
+            Home directory of the store
+        isPrivate : bool
+            Whether the connection is used for user (True) or domain (False) stores
+
+        Returns
+        -------
+        tuple(object, bool)
+            Connection and whether it was reused from the pool
+        """
+        from time import monotonic
+        key = (host, port, homedir, isPrivate)
+        now = monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                client, released = idle.pop()
+                if now-released < self.idleTimeout:
+                    return client, True
+            self._idle.pop(key, None)
+        return self.factory(host, port, homedir, isPrivate), False
+
+    def release(self, host, port, homedir, isPrivate, client):
+        """Return connection to the pool.
+
+        Parameters
+        ----------
+        host : str
+            Host the connection belongs to
+        port : str
+            Port the connection belongs to
+        homedir : str
+            Home directory the connection was created with
+        isPrivate : bool
+            Whether the connection is used for user (True) or domain (False) stores
+        client : object
+            Connection to return
+        """
+        from time import monotonic
+        if self.maxIdle <= 0:
+            return
+        now = monotonic()
+        with self._lock:
+            for key in list(self._idle):
+                self._idle[key] = [entry for entry in self._idle[key] if now-entry[1] < self.idleTimeout]
+                if not self._idle[key]:
+                    self._idle.pop(key)
+            while sum(len(idle) for idle in self._idle.values()) >= self.maxIdle:
+                oldest = min(self._idle, key=lambda key: self._idle[key][0][1])
+                self._idle[oldest].pop(0)
+                if not self._idle[oldest]:
+                    self._idle.pop(oldest)
+            self._idle.setdefault((host, port, homedir, isPrivate), []).append((client, now))
+
+    def clear(self):
+        """Discard all idle connections."""
+        with self._lock:
+            self._idle.clear()
+
+
 @ServiceHub.register("exmdb", exmdbHandleException)
 class ExmdbService:
     class _BoundClient:
+        """Exmdb client bound to a specific store.
+
+        Each call borrows a connection from the pool. If a reused connection turns
+        out to be broken, it is discarded and the call is retried once with a new one.
+        Connections that fail with a protocol or serialization error are discarded.
+        """
+
         def __init__(self, exmdb, host, port, homedir, isPrivate):
-            self.__homedir = homedir
-            self.__client = exmdb.ExmdbQueries(host, port, homedir, isPrivate)
+            self.__exmdb = exmdb
+            self.__target = (host, port, homedir, isPrivate)
+
+        def __call(self, attr, *args, **kwargs):
+            exmdb = self.__exmdb
+            host, port, homedir, isPrivate = self.__target
+            client, reused = exmdb.pool.acquire(host, port, homedir, isPrivate)
+            try:
+                try:
+                    result = getattr(client, attr)(homedir, *args, **kwargs)
+                except exmdb.ConnectionError:
+                    if not reused:
+                        raise
+                    client = exmdb.pool.factory(host, port, homedir, isPrivate)
+                    result = getattr(client, attr)(homedir, *args, **kwargs)
+            except (exmdb.ConnectionError, exmdb.ExmdbProtocolError, exmdb.SerializationError):
+                raise  # Connection state is unknown, do not reuse it
+            except exmdb.ExmdbError:
+                exmdb.pool.release(host, port, homedir, isPrivate, client)
+                raise
+            exmdb.pool.release(host, port, homedir, isPrivate, client)
+            return result
+
+        @property
+        def host(self):
+            return self.__target[0]
 
         def __getattr__(self, attr):
-            target = getattr(self.__client, attr)
-            if callable(target):
-                return lambda *args, **kwargs: target(self.__homedir, *args, **kwargs)
-            return target
+            if callable(getattr(self.__exmdb.ExmdbQueries, attr, None)):
+                return lambda *args, **kwargs: self.__call(attr, *args, **kwargs)
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, attr))
 
     __loaded = False
     __symbols = ("ConnectionError", "ExmdbError", "ExmdbProtocolError", "SerializationError", "ExmdbQueries", "Folder",
@@ -49,6 +177,8 @@ class ExmdbService:
 
         cls.host = Config["options"].get("exmdbHost", "::1")
         cls.port = Config["options"].get("exmdbPort", "5000")
+        cls.pool = ConnectionPool(pyexmdb.ExmdbQueries, Config["options"].get("exmdbPoolSize", 8),
+                                  Config["options"].get("exmdbIdleTimeout", 60))
         cls.pyexmdb = pyexmdb
         cls.loaded = True
 
@@ -69,11 +199,73 @@ class ExmdbService:
         """
         return self.ExmdbQueries(self.host, self.port, homedir, isPrivate)
 
+    def bind(self, host, homedir, isPrivate):
+        """Create client for a store using pooled connections.
+
+        Parameters
+        ----------
+        host : str
+            Host to connect to. If None, the configured exmdbHost is used.
+        homedir : str
+            Home directory of the user or domain.
+        isPrivate : bool
+            Whether it is a user (True) or domain (False) database
+
+        Returns
+        -------
+        services.exmdb.ExmdbService._BoundClient
+            Exmdb client bound to the specific store
+        """
+        return self._BoundClient(self, host or self.host, self.port, homedir, isPrivate)
+
+    def fanout(self, jobs, workers=None):
+        """Run calls on multiple stores concurrently.
+
+        Each homeserver gets its own pool of worker threads, so the number of
+        concurrent calls scales with the number of exmdb servers without
+        overloading a single one.
+
+        Parameters
+        ----------
+        jobs : Iterable
+            Tuples of (key, client, func), where `client` is a bound client (see `user`, `domain` or `bind`)
+            and `func` is called with the client as only argument.
+        workers : int, optional
+            Number of concurrent calls per server. If None, exmdbFanoutWorkers from the configuration is used.
+            The default is None.
+
+        Returns
+        -------
+        tuple(dict, dict)
+            Mapping of keys to results of successful calls and mapping of keys to exceptions of failed calls
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from tools.config import Config
+        workers = workers or Config["options"].get("exmdbFanoutWorkers", 4)
+        executors = {}
+        futures = {}
+        try:
+            for key, client, func in jobs:
+                if client.host not in executors:
+                    executors[client.host] = ThreadPoolExecutor(workers, thread_name_prefix="exmdb-"+client.host)
+                futures[key] = executors[client.host].submit(func, client)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+        results, errors = {}, {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as err:
+                errors[key] = err
+        return results, errors
+
     def user(self, user):
         """Create client for user.
 
         Connect to the users homeserver if specified, otherwise connect to configured exmdbHost.
         Connection is always established using the exmdbPort from the configuration.
+        Connections are reused across requests.
 
         Parameters
         ----------
@@ -85,14 +277,14 @@ class ExmdbService:
         services.exmdb.ExmdbService._BoundClient
             Exmdb client bound to the specific user
         """
-        host = user.homeserver.hostname if user.homeserver is not None else self.host
-        return self._BoundClient(self, host, self.port, user.maildir, True)
+        return self.bind(user.homeserver.hostname if user.homeserver is not None else None, user.maildir, True)
 
     def domain(self, domain):
         """Create client for domain.
 
         Connect to the domains homeserver if specified, otherwise connect to configured exmdbHost.
         Connection is always established using the exmdbPort from the configuration.
+        Connections are reused across requests.
 
         Parameters
         ----------
@@ -104,5 +296,4 @@ class ExmdbService:
         services.exmdb.ExmdbService._BoundClient
             Exmdb client bound to the specific domain
         """
-        host = domain.homeserver.hostname if domain.homeserver is not None else self.host
-        return self._BoundClient(self, host, self.port, domain.homedir, False)
+        return self.bind(domain.homeserver.hostname if domain.homeserver is not None else None, domain.homedir, False)
@@ -7,12 +7,14 @@ from . import ServiceHub, ServiceDisabledError, ServiceUnavailableError
 import ldap3
 import ldap3.core.exceptions as ldapexc
 import ldap3.utils.config as ldap3_conf
+import queue
 import re
 import threading
 import yaml
 
 from ldap3.utils.conv import escape_filter_chars
-from tools.misc import GenericObject
+from tools.config import Config
+from tools.misc import GenericObject, TTLCache
 
 import logging
 logger = logging.getLogger("ldap")
@@ -59,6 +61,8 @@ class LdapService:
         self._config = config or mconf.LDAP
         self._userAttributes = self._checkConfig(self._config)
         self.lock = threading.Lock()
+        self._dnCache = TTLCache(Config["security"].get("ldapDnCacheTime", 300), 10000)
+        self._authPool = queue.LifoQueue(Config["security"].get("ldapAuthConnections", 4))
         if self._config.get("disabled"):
             raise ServiceDisabledError("Service disabled by configuration")
         try:
@@ -284,6 +288,9 @@ class LdapService:
     def authUser(self, ID, password):
         """Attempt ldap bind for user with given ID and password
 
+        The DN of the user is cached to avoid searching the directory on every login.
+        If the cached DN no longer references a valid object, the DN is resolved again.
+
         Parameters
         ----------
         ID : str or bytes
@@ -296,16 +303,98 @@ class LdapService:
         str
             Error message if authentication failed or None if successful
         """
-        response = self._search(self._sbase, self._matchFilters(ID))
-        if len(response) == 0:
-            return "Invalid Username or password"
-        if len(response) > 1:
-            return "Multiple entries found - please contact your administrator"
-        userDN = response[0]["dn"]
+        userDN = self._dnCache.get(ID)
+        cached = userDN is not None
+        if not cached:
+            response = self._search(self._sbase, self._matchFilters(ID))
+            if len(response) == 0:
+                return "Invalid Username or password"
+            if len(response) > 1:
+                return "Multiple entries found - please contact your administrator"
+            userDN = response[0]["dn"]
+            self._dnCache[ID] = userDN
+        error = self._bind(userDN, password)
+        if error is None:
+            return
+        if error in ("noSuchObject", "invalidDNSyntax"):
+            self._dnCache.pop(ID, None)
+            if cached:
+                return self.authUser(ID, password)
+        return "Invalid username or Password"
+
+    def _bind(self, userDN, password):
+        """Check user credentials.
+
+        Uses a pooled connection if available. Connections are returned to the pool after a successful bind.
+        Only if the pooled connection fails with a connection error, the bind is repeated with a new connection,
+        so a wrong password results in a single failed bind.
+
+        Parameters
+        ----------
+        userDN : str
+            DN of the user
+        password : str
+            User password
+
+        Returns
+        -------
+        str
+            LDAP result description if the bind failed, None if it was successful
+        """
         try:
-            ldap3.Connection(self._config["connection"].get("server"), user=userDN, password=password, auto_bind=True)
-        except ldapexc.LDAPBindError:
-            return "Invalid username or Password"
+            conn = self._authPool.get_nowait()
+            try:
+                success = conn.rebind(user=userDN, password=password)
+                error = None if success else (conn.result or {}).get("description", "invalidCredentials")
+            except ldapexc.LDAPBindError:
+                success, error = False, "invalidCredentials"
+            except ldapexc.LDAPException:  # Stale connection, retry with a new one
+                conn.unbind()
+                conn = None
+        except queue.Empty:
+            conn = None
+        if conn is None:
+            conn = ldap3.Connection(self._authServer(), user=userDN, password=password)
+            starttls = self._config["connection"].get("starttls")
+            if starttls and not conn.start_tls():
+                logger.warning("Failed to initiate StartTLS connection")
+            try:
+                success = conn.bind()
+                error = None if success else (conn.result or {}).get("description", "invalidCredentials")
+            except ldapexc.LDAPBindError:
+                success, error = False, "invalidCredentials"
+        if success:
+            try:
+                self._authPool.put_nowait(conn)
+                return None
+            except queue.Full:
+                pass
+        conn.unbind()
+        return error
+
+    def _authServer(self):
+        """Get server object for user authentication.
+
+        Returns
+        -------
+        ldap3.Server or ldap3.ServerPool
+            Server (pool) to connect to
+        """
+        servers = [s[:-1] if s.endswith("/") else s for s in self._config["connection"]["server"].split()]
+        return servers[0] if len(servers) == 1 else ldap3.ServerPool(servers, "FIRST", active=1)
+
+    def invalidateDN(self, ID=None):
+        """Remove cached DN.
+
+        Parameters
+        ----------
+        ID : str or bytes, optional
+            ID of the LDAP object. If omitted, the whole cache is cleared. The default is None.
+        """
+        if ID is None:
+            self._dnCache.clear()
+        else:
+            self._dnCache.pop(ID)
 
     def downsyncUser(self, ID, props=None):
         """Create dictionary representation of the user from LDAP data.
@@ -334,10 +423,76 @@ class LdapService:
         except Exception:
             return None
         if len(response) == 0:
+            self._dnCache.pop(ID)
             return None
         if len(response) > 1:
+            self._dnCache.pop(ID)
             raise RuntimeError("Multiple entries found - aborting")
-        ldapuser = response[0]["attributes"]
+        self._dnCache[ID] = response[0]["dn"]
+        return self._userdata(response[0]["attributes"], props)
+
+    def downsyncUsers(self, IDs, batchSize=250):
+        """Create dictionary representations of multiple users.
+
+        Performs one search per batch instead of one search per user.
+
+        Parameters
+        ----------
+        IDs : list of str or bytes
+            LDAP IDs of the user objects
+        batchSize : int, optional
+            Maximum number of IDs to query with a single search. The default is 250.
+
+        Returns
+        -------
+        dict
+            Mapping of ID -> userdata. IDs that could not be found or are ambiguous are mapped to None.
+        """
+        IDattr = self._config["objectID"]
+        IDs = list(IDs)
+        results = {}
+        for offset in range(0, len(IDs), batchSize):
+            batch = IDs[offset:offset+batchSize]
+            try:
+                response = self._search(self._sbase, self._matchFiltersMulti(batch), attributes=["*", IDattr], limit=None)
+            except Exception as err:
+                logger.warning("Failed to download {} user{}: {}".format(len(batch), "" if len(batch) == 1 else "s",
+                                                                          " - ".join(str(arg) for arg in err.args)))
+                response = []
+            found = {}
+            for entry in response:
+                ID = entry["raw_attributes"][IDattr][0]
+                found[ID] = None if ID in found else entry["attributes"]
+                self._dnCache[ID] = entry["dn"]
+            for ID in batch:
+                ldapuser = found.get(ID)
+                if ldapuser is None:
+                    self._dnCache.pop(ID)
+                    results[ID] = None
+                    continue
+                try:
+                    results[ID] = self._userdata(ldapuser)
+                except Exception as err:
+                    logger.warning("Failed to convert LDAP object '{}': {}".format(self._dnCache.get(ID) or ID,
+                                                                                   " - ".join(str(arg) for arg in err.args)))
+                    results[ID] = None
+        return results
+
+    def _userdata(self, ldapuser, props=None):
+        """Convert LDAP attributes to user dictionary.
+
+        Parameters
+        ----------
+        ldapuser : dict
+            Attributes of the LDAP object
+        props : dict, optional
+            UserProperties as dictionary. The default is a dictionary containing storagequotalimit property.
+
+        Returns
+        -------
+        dict
+            Dictionary representation of the user or None if the object is incomplete
+        """
         if not self._userComplete(ldapuser, (self._config["users"]["username"],)):
             return None
         username, aliases = self._reduce(ldapuser[self._config["users"]["username"]], tail=True)
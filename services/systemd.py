@@ -4,11 +4,20 @@
 
 from . import ServiceHub
 
+import fcntl
+import json
+import logging
+import os
 import subprocess
+import threading
 import time
 
+from contextlib import contextmanager
 from datetime import datetime
 
+logger = logging.getLogger("systemd")
+
+
 def handleSystemdExceptions(service, error):
     if isinstance(error, FileNotFoundError):
         return  # Invalid argument, pass exception on to the caller...
@@ -16,6 +25,213 @@ def handleSystemdExceptions(service, error):
         return ServiceHub.ERROR
 
 
+class SystemctlBackend:
+    """Backend executing systemctl commands."""
+
+    def __init__(self, system):
+        self.mode = "--system" if system else "--user"
+
+    def show(self, properties, *units):
+        """Get properties of multiple units with a single call.
+
+        Parameters
+        ----------
+        properties : Iterable
+            Names of the properties to show
+        *units : str
+            Names of the units
+
+        Returns
+        -------
+        str
+            Output of `systemctl show`
+        """
+        args = ("systemctl", "-q", self.mode, "show", "--property="+",".join(properties), *units)
+        return subprocess.run(args, stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+    def run(self, command, *args):
+        """Run systemctl command.
+
+        Parameters
+        ----------
+        command : str
+            Command to execute
+        *args : str
+            Additional arguments (options and units)
+
+        Returns
+        -------
+        tuple(int, str)
+            Return code and output of the command
+        """
+        result = subprocess.run(("systemctl", "-q", self.mode, command, *args),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        return result.returncode, result.stdout
+
+
+class FakeBackend:
+    """In-memory backend for testing and systems without systemd.
+
+    Units are created on first access and all commands succeed.
+    Executed commands are recorded in `calls`.
+    """
+
+    def __init__(self, system=True):
+        self.units = {}
+        self.calls = []
+
+    def _unit(self, name):
+        if name not in self.units:
+            self.units[name] = {"Names": name, "ActiveState": "active", "SubState": "running",
+                                "UnitFileState": "enabled", "Description": name,
+                                "ActiveEnterTimestampMonotonic": "0", "InactiveEnterTimestampMonotonic": "0"}
+        return self.units[name]
+
+    def show(self, properties, *units):
+        return "\n\n".join("\n".join("{}={}".format(key, value) for key, value in self._unit(unit).items()
+                                     if key in properties) for unit in units)
+
+    def run(self, command, *args):
+        self.calls.append((command,)+args)
+        states = {"start": "active", "restart": "active", "stop": "inactive"}
+        for unit in (arg for arg in args if not arg.startswith("-")):
+            if command in states:
+                self._unit(unit)["ActiveState"] = states[command]
+            elif command in ("enable", "disable"):
+                self._unit(unit)["UnitFileState"] = command+"d"
+        return 0, ""
+
+
+class ReloadBatcher:
+    """Collect reload requests and execute them in a single call.
+
+    The first request starts a timer. All units requested until it expires are
+    reloaded together with a single non-blocking `systemctl reload`.
+
+    Reloads of the same unit are coalesced across processes: the time of the last
+    reload of each unit is kept in a shared state file. A request is dropped if
+    the unit was reloaded (by any process) after the request was made, and
+    postponed until `minInterval` seconds have passed since the last reload.
+
+    Pending reloads are executed on shutdown, regardless of `minInterval`.
+    """
+
+    def __init__(self, run, delay, minInterval=0, stateFile=None):
+        """Initialize batcher.
+
+        Parameters
+        ----------
+        run : function
+            Function executing a systemctl command
+        delay : float
+            Time in seconds to collect reload requests
+        minInterval : float, optional
+            Minimum time in seconds between two reloads of the same unit. The default is 0.
+        stateFile : str, optional
+            Path of the file shared with other processes. If omitted or inaccessible,
+            reloads are only coalesced within the current process. The default is None.
+        """
+        import atexit
+        self._run = run
+        self.delay = delay
+        self.minInterval = minInterval
+        self.stateFile = stateFile
+        self._pending = {}
+        self._localState = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush, True)
+
+    def add(self, *units):
+        """Schedule units for reload.
+
+        Parameters
+        ----------
+        *units : str
+            Names of the units to reload
+        """
+        now = time.time()
+        with self._lock:
+            for unit in units:
+                self._pending.setdefault(unit, now)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="systemd reload", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        wait = self.delay
+        while True:
+            time.sleep(wait)
+            wait = max(self.flush(), self.delay)
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+    @contextmanager
+    def _state(self):
+        """Open and lock shared state, saving changes on exit."""
+        try:
+            file = os.fdopen(os.open(self.stateFile, os.O_RDWR | os.O_CREAT, 0o660), "r+") if self.stateFile else None
+        except OSError:
+            file = None
+        if file is None:
+            yield self._localState
+            return
+        with file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                state = json.loads(file.read() or "{}")
+            except ValueError:
+                state = {}
+            yield state
+            file.seek(0)
+            file.truncate()
+            json.dump(state, file)
+
+    def flush(self, force=False):
+        """Reload pending units that are due.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Reload all pending units, ignoring the minimum interval. The default is False.
+
+        Returns
+        -------
+        float
+            Time in seconds until the next postponed reload is due, or 0 if nothing is pending
+        """
+        now = time.time()
+        due = []
+        wait = 0
+        with self._lock:
+            if not self._pending:
+                return 0
+            with self._state() as state:
+                for unit, requested in list(self._pending.items()):
+                    last = state.get(unit, 0)
+                    if last >= requested:
+                        self._pending.pop(unit)
+                    elif force or now-last >= self.minInterval:
+                        self._pending.pop(unit)
+                        state[unit] = now
+                        due.append(unit)
+                    else:
+                        wait = min(wait or self.minInterval, last+self.minInterval-now)
+        if not due:
+            return wait
+        try:
+            code, output = self._run("reload", "--no-block", *sorted(due))
+        except Exception as err:
+            code, output = -1, " - ".join(str(arg) for arg in err.args)
+        if code:
+            logger.warning("Failed to reload {}: {}".format(", ".join(sorted(due)), output.strip()))
+        else:
+            logger.debug("Reloaded "+", ".join(sorted(due)))
+        return wait
+
+
 @ServiceHub.register("systemd", handleSystemdExceptions)
 class Systemd:
     valmap = {"ActiveState": "state",
@@ -26,22 +242,25 @@ class Systemd:
               "InactiveEnterTimestampMonotonic": "si",
               "Names": "unit"}
 
-    def __init__(self, system=None):
+    backends = {"systemctl": SystemctlBackend, "fake": FakeBackend}
+
+    def __init__(self, system=None, backend=None):
         from tools.config import Config
         self.system = system if system is not None else not Config["options"].get("systemdUser", False)
-
-    @property
-    def __mode(self):
-        return "--system" if self.system else "--user"
+        backend = backend or Config["options"].get("systemdBackend", "systemctl")
+        if backend not in self.backends:
+            raise ValueError("Unknown systemd backend '{}'".format(backend))
+        self.backend = self.backends[backend](self.system)
+        self.reloads = ReloadBatcher(self.run, Config["options"].get("systemdReloadDelay", 1),
+                                     Config["options"].get("systemdReloadInterval", 10),
+                                     Config["options"].get("systemdReloadState", "/run/grommunio/admin-reload.json"))
 
     def getServices(self, *services):
-        args = ("systemctl", "-q", self.__mode, "show",
-                "--property="+",".join(self.valmap), *services)
-        result = subprocess.run(args, stdout=subprocess.PIPE, universal_newlines=True)
-        split = [[line.split("=", 1) for line in block.split("\n") if "=" in line] for block in result.stdout.split("\n\n")]
+        output = self.backend.show(self.valmap, *services)
+        split = [[line.split("=", 1) for line in block.split("\n") if "=" in line] for block in output.split("\n\n")]
         units = [{self.valmap[key]: value for key, value in block if key in self.valmap} for block in split]
         for unit in units:
-            since = unit["sa"] if unit["state"] == "active" else unit["si"]
+            since = unit.get("sa") if unit.get("state") == "active" else unit.get("si")
             try:
                 since = time.clock_gettime(time.CLOCK_REALTIME)-time.clock_gettime(time.CLOCK_MONOTONIC)+int(since)/1000000
                 since = datetime.fromtimestamp(int(since)).strftime("%Y-%m-%d %H:%M:%S") if since != 0 else None
@@ -52,9 +271,7 @@ class Systemd:
         return {unit["unit"]: unit for unit in units if "unit" in unit}
 
     def run(self, command, *targets):
-        result = subprocess.run(("systemctl", "-q", self.__mode, command, *targets),
-                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-        return result.returncode, result.stdout
+        return self.backend.run(command, *targets)
 
     def startService(self, *services):
         return self.run("start", *services)
@@ -65,7 +282,23 @@ class Systemd:
     def restartService(self, *services):
         return self.run("restart", *services)
 
-    def reloadService(self, *services):
+    def reloadService(self, *services, delayed=True):
+        """Reload services.
+
+        Parameters
+        ----------
+        *services : str
+            Names of the services to reload
+        delayed : bool, optional
+            Collect requests for a short time and reload asynchronously. The default is True.
+
+        Returns
+        -------
+        tuple(int, str)
+            Return code and output of systemctl or None if the reload was scheduled
+        """
+        if delayed:
+            return self.reloads.add(*services)
         return self.run("reload", *services)
 
     def tryReloadRestartService(self, *services):
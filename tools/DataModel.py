@@ -57,7 +57,7 @@ class DataModel:
 
         def __init__(self, attr, alias=None, flags=None, args=(), kwargs={}, mask=None, target=None, dispname=None,
                      flat=None, func=None, link=None, filter=None, qopt=joinedload, proxy=None, arg_tf=None, match="default",
-                     **unknown):
+                     preload=None, **unknown):
             """
             Initialize Prop.
 
@@ -102,6 +102,10 @@ class DataModel:
                 Function transform request arguments into the correct format/type. Used by filter and match operations.
             match: str, optional
                 Mode used by automatch. Default mode uses substring matching, "exact" performs equality matching.
+            preload: function, optional
+                Function returning a query option that loads everything needed to serialize the attribute, given the
+                mapped class. Replaces `qopt` for query optimization and allows optimizing props that are not relationships.
+                The default is None.
             **unknown : dict
                 Keyword arguments not recognized by DataModel. Will issue a warning in the logger.
             """
@@ -121,6 +125,7 @@ class DataModel:
             self.proxy = proxy
             self.arg_tf = arg_tf
             self.match = match
+            self.preload = preload
             if len(unknown):
                 logger.warn("Unknown DataModel parameters: "+", ".join(unknown.keys()))
 
@@ -364,6 +369,9 @@ class DataModel:
     def optimize_query(cls, query, spec):
         """Optimize query by eager loading relationships.
 
+        Relationship props are loaded using their `qopt`, props with a `preload` function
+        are loaded with the returned option.
+
         Parameters
         ----------
         cls : Class
@@ -381,12 +389,52 @@ class DataModel:
         """
         cls._init()
         if isinstance(spec, int):
-            propsel = lambda prop: "ref" in prop.flags
+            propsel = lambda prop: "ref" in prop.flags or prop.preload is not None
         else:
             sspec = set(spec)
-            propsel = lambda prop: "ref" in prop.flags and prop.attr in sspec
+            propsel = lambda prop: ("ref" in prop.flags or prop.preload is not None) and prop.attr in sspec
             spec = None
-        return query.options(prop.qopt(prop.value(cls, "raw")) for prop in cls._meta.props(spec, propsel))
+        return query.options(prop.preload(cls) if prop.preload is not None else prop.qopt(prop.value(cls, "raw"))
+                             for prop in cls._meta.props(spec, propsel))
+
+    @classmethod
+    def prefetch(cls, objects, spec):
+        """Prefetch data required to serialize multiple objects.
+
+        Called before a list of objects is serialized. Allows models to retrieve data
+        that cannot be loaded by query options (e.g. from remote services) in bulk.
+
+        The default implementation does nothing.
+
+        Parameters
+        ----------
+        objects : list
+            Objects that will be serialized
+        spec : int or iterable
+            Level of detail or list of attribute names
+        """
+        pass
+
+    @classmethod
+    def inSpec(cls, spec, attr):
+        """Check whether an attribute is included in a serialization.
+
+        Parameters
+        ----------
+        spec : int or iterable
+            Level of detail or list of attribute names
+        attr : str
+            Name of the attribute
+
+        Returns
+        -------
+        bool
+            True if the attribute is serialized, False otherwise
+        """
+        cls._init()
+        if isinstance(spec, int):
+            return any(prop.attr == attr and "hidden" not in prop.flags for prop in cls._meta.props(spec))
+        return attr in spec
 
     @classmethod
     def optimized_query(cls, spec):
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
-import re
+import operator
+
+from .constants import PropTypes
 
 class ClassFilter:
     class Condition:
@@ -41,12 +43,68 @@ class ClassFilter:
             if self.op not in self.unary and ("val" not in data or type(data["val"]) != str):
                 raise ValueError("Invalid filter value (must be string)")
 
-        def sql(self, alias):
-            value = None if self.value is None else "'{}'".format(self.value if self.op == "li" else self.value)
+        def validate(self):
+            """Check whether the value can be compared to the prop tag.
+
+            Regular expressions are matched against the string representation and always accepted.
+
+            Raises
+            ------
+            ValueError
+                The prop tag is numeric, but the value is not
+            """
+            if self.type == "p" and self.op not in self.unary and self.op != "li" and \
+               PropTypes.pyType(self.target) in (int, float) and self.numeric is None:
+                raise ValueError("Invalid filter value '{}' (must be numeric)".format(self.value))
+
+        def clause(self, props):
+            """Create SQLAlchemy expression for this condition.
+
+            Numeric properties are compared numerically, unless the value is not a number
+            (as possible for filters stored before values were validated), in which case
+            the string representation is compared. All values are passed as bound parameters.
+
+            Parameters
+            ----------
+            props : dict
+                Mapping of prop tags to aliased UserProperties
+
+            Returns
+            -------
+            sqlalchemy.sql.ClauseElement
+                Filter expression
+            """
+            from orm.users import Users
+            from sqlalchemy import cast
+            from sqlalchemy.types import Numeric
             if self.type == "c":
-                return "{}.{} {} {}".format(alias, self.target, self.sqlops[self.op], "" if self.op in self.unary else value)
-            elif self.type == "p":
-                return "{}.propval_str {} {}".format(alias, self.sqlops[self.op], "" if self.op in self.unary else value)
+                column = getattr(Users, self.target)
+            else:
+                column = props[self.target]._propvalstr
+            if self.op == "ex":
+                return column.isnot(None)
+            if self.op == "nx":
+                return column.is_(None)
+            if self.op == "li":
+                return column.op("RLIKE")(self.value)
+            value = self.value
+            if self.type == "p" and self.numeric is not None:
+                column = cast(column, Numeric(65, 30))
+                value = self.numeric
+            return getattr(operator, self.op)(column, value)
+
+        @property
+        def numeric(self):
+            """Filter value converted to the type of the prop tag, or None if the tag or the value is not numeric."""
+            if self.type != "p" or self.op in self.unary:
+                return None
+            proptype = PropTypes.pyType(self.target)
+            if proptype not in (int, float):
+                return None
+            try:
+                return proptype(self.value)
+            except ValueError:
+                return None
 
     def __init__(self, data):
         if isinstance(data, str):
@@ -56,10 +114,47 @@ class ClassFilter:
         if len(self.expressions) == 0 or min(len(disj) for disj in self.expressions) == 0:
             raise ValueError("Cannot use empty filter expression")
 
-    def sql(self, columns):
-        tags = {expr.target for conj in self.expressions for expr in conj if expr.type == "p"}
-        joins = " ".join("LEFT JOIN user_properties AS up_{tag} on u.id=up_{tag}.user_id AND up_{tag}.proptag='{tag}'"
-                          .format(tag=tag) for tag in tags)
-        filters = ") AND (".join(" OR ".join(expr.sql("u" if expr.type == "c" else "up_"+str(expr.target)) for expr in conj)
-                               for conj in self.expressions)
-        return "SELECT {} FROM users AS u {} WHERE ({})".format(columns, joins, filters)
+    def validate(self):
+        """Check all conditions for values incompatible with their prop tag.
+
+        Only applied to new filters, so that stored filters remain usable.
+
+        Returns
+        -------
+        ClassFilter
+            The filter itself
+
+        Raises
+        ------
+        ValueError
+            A condition is invalid
+        """
+        for conj in self.expressions:
+            for expr in conj:
+                expr.validate()
+        return self
+
+    def query(self, *columns):
+        """Create query selecting all users matching the filter.
+
+        Each referenced prop tag is joined exactly once, regardless of the number of conditions using it.
+
+        Parameters
+        ----------
+        *columns : sqlalchemy.Column
+            Columns to select. If omitted, user ID and username are selected.
+
+        Returns
+        -------
+        sqlalchemy.orm.Query
+            Query object
+        """
+        from orm.users import Users, UserProperties
+        from sqlalchemy import and_, or_
+        from sqlalchemy.orm import aliased
+        tags = sorted({expr.target for conj in self.expressions for expr in conj if expr.type == "p"})
+        props = {tag: aliased(UserProperties, name="up_{}".format(tag)) for tag in tags}
+        query = Users.query.with_entities(*(columns or (Users.ID, Users.username)))
+        for tag, prop in props.items():
+            query = query.outerjoin(prop, and_(prop.userID == Users.ID, prop.tag == tag))
+        return query.filter(and_(*(or_(*(expr.clause(props) for expr in conj)) for conj in self.expressions)))
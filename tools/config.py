@@ -57,6 +57,10 @@ def _defaultConfig():
     return {
         "DB": {
             "sessionTimout": 28800,
+            "versionCheckInterval": 60,
+            "confCacheTime": 60,
+            "filterCacheTime": 300,
+            "hierarchyCacheTime": 300,
             },
         "openapi": {
             "validateRequest": True,
@@ -72,6 +76,10 @@ def _defaultConfig():
             "userPrefix": "/var/lib/gromox/user/",
             "exmdbHost": "::1",
             "exmdbPort": "5000",
+            "exmdbPoolSize": 8,
+            "exmdbIdleTimeout": 60,
+            "exmdbFanoutWorkers": 4,
+            "folderCacheTime": 60,
             "domainStorageLevels": 1,
             "userStorageLevels": 2,
             "domainAcceleratedStorage": None,
@@ -79,12 +87,16 @@ def _defaultConfig():
             "dashboard": {
                 "services": []
                 },
-            "serverPolicy": "round-robin"
+            "serverPolicy": "round-robin",
+            "purgeBatchSize": 1000,
+            "purgeWorkers": 4,
             },
         "security": {
             "jwtPrivateKeyFile": "/etc/grommunio-admin-api/jwt-privkey.pem",
             "jwtPublicKeyFile": "/etc/grommunio-admin-api/jwt-pubkey.pem",
             "rsaKeySize": 4096,
+            "ldapDnCacheTime": 300,
+            "ldapAuthConnections": 4,
             },
         "mconf": {
           "ldapPath": "/etc/gromox/ldap_adaptor.cfg",
@@ -98,6 +110,9 @@ def _defaultConfig():
             },
         "chat": {
             "connection": {},
+            "cacheTime": 10,
+            "retries": 3,
+            "retryDelay": 2,
             },
         "tasq": {},
         }
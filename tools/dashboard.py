@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2021 grommunio GmbH
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import deque
+from datetime import datetime
+
+from tools.config import Config
+
+logger = logging.getLogger("dashboard")
+
+
+def _conf():
+    conf = Config["options"]["dashboard"]
+    return (conf.get("interval", 5), conf.get("history", 60), conf.get("idleTimeout", 60),
+            conf.get("sampleFile", "/run/grommunio/admin-dashboard.json"))
+
+
+def collect():
+    """Collect system and service statistics.
+
+    Returns
+    -------
+    dict
+        Dashboard sample
+    """
+    import psutil
+    disks = []
+    for disk in psutil.disk_partitions():
+        try:
+            usage = psutil.disk_usage(disk.mountpoint)
+            stat = {"percent": usage.percent, "total": usage.total, "used": usage.used, "free": usage.free}
+            stat["device"] = disk.device
+            stat["mountpoint"] = disk.mountpoint
+            stat["filesystem"] = disk.fstype
+            disks.append(stat)
+        except:
+            pass
+    cpu = psutil.cpu_times_percent()
+    cpuPercent = dict(user=cpu.user, system=cpu.system, io=cpu.iowait, interrupt=cpu.irq+cpu.softirq, steal=cpu.steal,
+                      idle=cpu.idle)
+    vm = psutil.virtual_memory()
+    memory = dict(percent=vm.percent, total=vm.total, used=vm.used, buffer=vm.buffers, cache=vm.cached, free=vm.free,
+                  available=vm.available)
+    sm = psutil.swap_memory()
+    swap = dict(percent=sm.percent, total=sm.total, used=sm.used, free=sm.free)
+    return dict(timestamp=time.time(),
+                disks=disks,
+                load=os.getloadavg(),
+                cpuPercent=cpuPercent,
+                memory=memory,
+                swap=swap,
+                booted=datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S"),
+                services=collectServices())
+
+
+def collectServices():
+    """Get status of all services configured for the dashboard.
+
+    Returns
+    -------
+    list
+        List of service status dicts
+    """
+    from services import Service
+    known = Config["options"]["dashboard"]["services"]
+    if len(known) == 0:
+        return []
+    with Service("systemd", Service.SUPPRESS_INOP) as sysd:
+        units = sysd.getServices(*(service["unit"] for service in known))
+        for service in known:
+            if service["unit"] not in units:
+                continue
+            units[service["unit"]]["name"] = service.get("name", service["unit"].replace(".service", ""))
+        return list(units.values())
+    return []
+
+
+class Sampler:
+    """Background sampler for dashboard data.
+
+    Samples are collected at a fixed interval and written to a file shared by all
+    worker processes. Only one process (holding an exclusive lock on the file) collects
+    samples, all others read the file. Readers refresh the modification time of the lock
+    file, so sampling stops if nobody requested data for a while. If the sampling
+    process exits, the next reader takes over.
+    """
+
+    _lock = threading.Lock()
+    _thread = None
+    _cached = None
+    _cachedMtime = None
+    _history = None
+
+    @classmethod
+    def get(cls):
+        """Get latest sample and history.
+
+        Returns
+        -------
+        dict
+            Latest sample with additional `history` list
+        """
+        interval, _, _, sampleFile = _conf()
+        try:
+            os.utime(sampleFile+".lock")
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return cls._inline()
+        with cls._lock:
+            data = cls._read(sampleFile)
+            if data is not None and time.time()-data["timestamp"] <= 2*interval:
+                return data
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._start(sampleFile)
+        return cls._inline()
+
+    @classmethod
+    def _inline(cls):
+        sample = collect()
+        sample["history"] = [cls._compact(sample)]
+        return sample
+
+    @classmethod
+    def _read(cls, sampleFile):
+        try:
+            mtime = os.stat(sampleFile).st_mtime
+            if mtime != cls._cachedMtime:
+                with open(sampleFile, encoding="utf-8") as file:
+                    cls._cached = json.load(file)
+                cls._cachedMtime = mtime
+        except (OSError, ValueError):
+            return None
+        return cls._cached
+
+    @classmethod
+    def _start(cls, sampleFile):
+        try:
+            lockfile = open(sampleFile+".lock", "a")
+            fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+        cls._thread = threading.Thread(target=cls._run, args=(lockfile, sampleFile), name="Dashboard sampler", daemon=True)
+        cls._thread.start()
+
+    @staticmethod
+    def _compact(sample):
+        return dict(timestamp=sample["timestamp"], load=sample["load"], cpuPercent=sample["cpuPercent"],
+                    memory=sample["memory"]["percent"], swap=sample["swap"]["percent"])
+
+    @classmethod
+    def _run(cls, lockfile, sampleFile):
+        logger.debug("Dashboard sampler started")
+        interval, history, idleTimeout, _ = _conf()
+        cls._history = deque(cls._cached.get("history", ()) if cls._cached else (), maxlen=history)
+        try:
+            while time.time()-os.fstat(lockfile.fileno()).st_mtime < idleTimeout:
+                start = time.monotonic()
+                try:
+                    sample = collect()
+                    cls._history.append(cls._compact(sample))
+                    sample["history"] = list(cls._history)
+                    tmpFile = "{}.{}".format(sampleFile, os.getpid())
+                    with open(tmpFile, "w", encoding="utf-8") as file:
+                        json.dump(sample, file, separators=(",", ":"))
+                    os.replace(tmpFile, sampleFile)
+                except Exception as err:
+                    logger.warning("Failed to collect dashboard data: {} ({})"
+                                   .format(type(err).__name__, " - ".join(str(arg) for arg in err.args)))
+                time.sleep(max(interval-(time.monotonic()-start), 0))
+        finally:
+            lockfile.close()
+            logger.debug("Dashboard sampler stopped")
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2021 grommunio GmbH
+
+from bisect import bisect_right
+from datetime import datetime
+from itertools import islice
+
+from services import Service
+from tools.config import Config
+from tools.misc import TTLCache
+from tools.rop import nxTime
+
+
+class FolderCache:
+    """Cache for public folder listings.
+
+    The complete list of subfolders is fetched once per parent folder and kept
+    in memory, sorted by folder ID. Listings are dropped when folders of the domain are created,
+    modified or deleted through the API, or after `options.folderCacheTime`
+    seconds to pick up external changes.
+    """
+
+    _cache = TTLCache(Config["options"].get("folderCacheTime", 60), 1000)
+    chunkSize = 1000
+
+    @staticmethod
+    def _convert(entry):
+        return {"folderid": str(entry.folderId),
+                "displayname": entry.displayName,
+                "comment": entry.comment,
+                "creationtime": datetime.fromtimestamp(nxTime(entry.creationTime)).strftime("%Y-%m-%d %H:%M:%S"),
+                "container": entry.container}
+
+    @classmethod
+    def _load(cls, domain, parentID):
+        folders = []
+        with Service("exmdb") as exmdb:
+            client = exmdb.domain(domain)
+            restriction = exmdb.Restriction.NULL()
+            while True:
+                response = exmdb.FolderList(client.listFolders(parentID, limit=cls.chunkSize, offset=len(folders),
+                                                               restriction=restriction))
+                folders += [cls._convert(entry) for entry in response.folders]
+                if len(response.folders) < cls.chunkSize:
+                    break
+        folders.sort(key=lambda folder: int(folder["folderid"]))
+        return folders, [int(folder["folderid"]) for folder in folders]
+
+    @classmethod
+    def get(cls, domain, parentID):
+        """Get all subfolders of a public folder.
+
+        Parameters
+        ----------
+        domain : orm.domains.Domains
+            Domain providing homeserver and homedir
+        parentID : int
+            ID of the parent folder
+
+        Returns
+        -------
+        tuple(list, list)
+            List of folder dicts, sorted by folder ID, and list of the (numeric) folder IDs
+        """
+        key = (domain.homedir, parentID)
+        entry = cls._cache.get(key)
+        if entry is None:
+            entry = cls._cache[key] = cls._load(domain, parentID)
+        return entry
+
+    @classmethod
+    def list(cls, domain, parentID, limit=50, offset=0, cursor=None, match=None):
+        """Get a page of subfolders.
+
+        Folders are ordered by folder ID.
+
+        Parameters
+        ----------
+        domain : orm.domains.Domains
+            Domain providing homeserver and homedir
+        parentID : int
+            ID of the parent folder
+        limit : int, optional
+            Maximum number of folders to return. The default is 50.
+        offset : int, optional
+            Number of folders to skip. Ignored if `cursor` is given. The default is 0.
+        cursor : str, optional
+            ID of the last folder of the previous page. The listing continues with the next folder ID,
+            even if the folder itself no longer exists. The default is None.
+        match : str, optional
+            Only return folders whose name or comment contains this string (case insensitive). The default is None.
+
+        Returns
+        -------
+        tuple(list, str)
+            List of folder dicts and cursor for the next page (None if there are no more folders)
+
+        Raises
+        ------
+        ValueError
+            The cursor is not a folder ID
+        """
+        folders, IDs = cls.get(domain, parentID)
+        start = 0
+        if cursor is not None:
+            try:
+                start = bisect_right(IDs, int(cursor))
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            offset = 0
+        end = start+offset+limit+1 if limit else None
+        if match:
+            match = match.lower()
+            matching = (folders[index] for index in range(start, len(folders))
+                        if match in (folders[index]["displayname"] or "").lower() or
+                        match in (folders[index]["comment"] or "").lower())
+            page = list(islice(matching, offset, None if end is None else end-start))
+        else:
+            page = folders[start+offset:end]
+        more = limit and len(page) > limit
+        if more:
+            page = page[:limit]
+        return page, page[-1]["folderid"] if more else None
+
+    @classmethod
+    def invalidate(cls, homedir):
+        """Drop all cached listings of a domain.
+
+        Parameters
+        ----------
+        homedir : str
+            Home directory of the domain
+        """
+        for key, _ in cls._cache.items():
+            if key[0] == homedir:
+                cls._cache.pop(key)
@@ -2,7 +2,10 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2021 grommunio GmbH
 
-from systemd.journal import Reader
+from systemd.journal import NOP, Reader
+
+import time
+
 
 class LogReader:
     """Central log reader class."""
@@ -47,12 +50,12 @@ class LogReader:
         Raises
         ------
         ValueError
-            `source` is not a registered log reader
+            `source` is not a registered log reader or the log reader rejected the arguments
 
         Returns
         -------
-        list
-            List of log file entries
+        tuple(list, str)
+            List of log file entries and cursor of the last entry read
         """
         if source not in cls.rreg:
             raise ValueError("Unknown source '{}'".format(source))
@@ -74,6 +77,9 @@ class JournaldReader:
         self.reader = Reader()
         self.reader.add_match(_SYSTEMD_UNIT=unit)
 
+    limit = 1000  # Maximum number of entries returned by forward reads
+    maxWait = 5  # Maximum time to wait for new entries
+
     @staticmethod
     def _entry(data):
         return dict(level=data["PRIORITY"],
@@ -81,7 +87,31 @@ class JournaldReader:
                     time=data["__REALTIME_TIMESTAMP"].strftime("%Y-%m-%d %H:%M:%S.%f"),
                     runtime=data["__MONOTONIC_TIMESTAMP"].timestamp.total_seconds())
 
-    def tail(self, n=10, skip=0, after=None):
+    def _filter(self, level, search):
+        """Apply filters and return match function for remaining conditions."""
+        if level is not None:
+            for priority in range(0, level+1):
+                self.reader.add_match(PRIORITY=str(priority))
+        if not search:
+            return lambda entry: True
+        search = search.lower()
+        return lambda entry: search in str(entry.get("MESSAGE", "")).lower()
+
+    def _forward(self, match, start=None, cursor=None):
+        """Read entries following the current position."""
+        entries = []
+        while len(entries) < self.limit:
+            entry = self.reader.get_next()
+            if len(entry) == 0:
+                break
+            if entry["__CURSOR"] == cursor or (start is not None and entry["__REALTIME_TIMESTAMP"] <= start):
+                continue
+            cursor = entry["__CURSOR"]
+            if match(entry):
+                entries.append(self._entry(entry))
+        return entries, cursor
+
+    def tail(self, n=10, skip=0, after=None, cursor=None, level=None, search=None, wait=0):
         """Get log tail.
 
         Parameters
@@ -92,22 +122,51 @@ class JournaldReader:
             Number of lines to skip. The default is 0.
         after : datetime, optional
             Return all lines after given time point. Overrides `n` and `skip`. The default is None.
+        cursor : str, optional
+            Return all lines after the given journal cursor. Overrides `n`, `skip` and `after`. The default is None.
+        level : int, optional
+            Only return entries with at most this priority level. The default is None.
+        search : str, optional
+            Only return entries containing this text (case insensitive). The default is None.
+        wait : float, optional
+            If reading after a time point or cursor, wait up to this number of seconds
+            for new entries if there are none. Limited to `maxWait` seconds. The default is 0.
+
+        Raises
+        ------
+        ValueError
+            `cursor` is not a valid journal cursor
 
         Returns
         -------
-        list
-            List of log file entries
+        tuple(list, str)
+            List of log file entries and cursor of the last entry read
         """
-        self.reader.seek_tail()
-        if after is None:
-            if skip > 0:
-                self.reader.get_previous(skip)
-            entries = reversed([self.reader.get_previous() for _ in range(n)])
-            return [self._entry(entry) for entry in entries if len(entry) != 0]
-        entries = []
-        while True:
-            entry = self.reader.get_previous()
-            if len(entry) == 0 or entry["__REALTIME_TIMESTAMP"] <= after:
-                break
-            entries.append(self._entry(entry))
-        return list(reversed(entries))
+        match = self._filter(level, search)
+        if cursor is None and after is None:
+            self.reader.seek_tail()
+            entries = []
+            last = None
+            while len(entries) < n+skip:
+                entry = self.reader.get_previous()
+                if len(entry) == 0:
+                    break
+                last = last or entry["__CURSOR"]
+                if match(entry):
+                    entries.append(entry)
+            return [self._entry(entry) for entry in reversed(entries[skip:])], last
+        if cursor is not None:
+            try:
+                self.reader.seek_cursor(cursor)
+            except OSError:
+                raise ValueError("Invalid cursor")
+        else:
+            self.reader.seek_realtime(after)
+        entries, last = self._forward(match, after, cursor)
+        deadline = time.monotonic()+min(wait, self.maxWait)
+        while not entries and time.monotonic() < deadline:
+            if self.reader.wait(deadline-time.monotonic()) == NOP:
+                continue
+            more, last = self._forward(match, after, last)
+            entries += more
+        return entries, last
@@ -81,6 +81,125 @@ class GenericObject:
         return getattr(self, item)
 
 
+class TTLCache:
+    """Thread-safe dictionary with expiring entries."""
+
+    def __init__(self, ttl, maxsize=None):
+        """Initialize cache.
+
+        Parameters
+        ----------
+        ttl : float
+            Time (in seconds) after which entries expire
+        maxsize : int, optional
+            Maximum number of entries. If exceeded, expired entries are removed
+            and, if necessary, the oldest entries are evicted. The default is None.
+        """
+        from threading import Lock
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Get value for key.
+
+        Parameters
+        ----------
+        key : Any
+            Key to look up
+        default : Any, optional
+            Value to return if the key is not present or expired. The default is None.
+
+        Returns
+        -------
+        Any
+            The cached value or default
+        """
+        from time import monotonic
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] < monotonic():
+                self._data.pop(key, None)
+                return default
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Add or update entry.
+
+        Parameters
+        ----------
+        key : Any
+            Key of the entry
+        value : Any
+            Value to store
+        ttl : float, optional
+            Override default time to live. The default is None.
+        """
+        from time import monotonic
+        now = monotonic()
+        with self._lock:
+            if self.maxsize and len(self._data) >= self.maxsize and key not in self._data:
+                self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+                while len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (now+(self.ttl if ttl is None else ttl), value)
+
+    def pop(self, key, default=None):
+        """Remove entry.
+
+        Parameters
+        ----------
+        key : Any
+            Key to remove
+        default : Any, optional
+            Value to return if the key is not present. The default is None.
+
+        Returns
+        -------
+        Any
+            The removed value (regardless of expiration) or default
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def items(self):
+        """Get list of all unexpired entries.
+
+        Returns
+        -------
+        list
+            List of (key, value) tuples
+        """
+        from time import monotonic
+        now = monotonic()
+        with self._lock:
+            return [(key, entry[1]) for key, entry in self._data.items() if entry[0] >= now]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data = {}
+
+
 def setDirectoryOwner(path, uid=None, gid=None):
     """Recursively set directory ownership of path.
 
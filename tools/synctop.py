@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2021 grommunio GmbH
+
+import json
+import logging
+import threading
+import time
+
+from services import Service
+from tools.config import Config
+
+logger = logging.getLogger("synctop")
+
+
+class SyncTop:
+    """Shared view of the grommunio-sync top data.
+
+    The top data hash is read at most once per refresh interval, regardless of
+    the number of requests. The decoded data is shared with other processes
+    via redis, so only one process performs the refresh.
+
+    Only entries that changed since the last refresh are decoded. Expiration
+    times are kept in a sorted set, so expired entries can be removed without
+    inspecting the whole hash.
+    """
+
+    cacheKey = "grommunio-admin:topcache"
+    lockKey = "grommunio-admin:toplock"
+    indexKey = "grommunio-admin:topindex"
+
+    _lock = threading.Lock()
+    _raw = {}
+    _decoded = {}
+    _data = []
+    _loaded = 0
+
+    @staticmethod
+    def _conf():
+        sync = Config["sync"]
+        return (sync.get("topdataKey", "grommunio-sync:topdata"),
+                sync.get("topTimestampKey", "grommunio-sync:topenabledat"),
+                sync.get("topExpireUpdate", 120),
+                sync.get("topExpireEnded", 20),
+                sync.get("topRefreshInterval", 2))
+
+    @classmethod
+    def get(cls, filterUpdated, filterEnded):
+        """Get current top data.
+
+        Parameters
+        ----------
+        filterUpdated : int
+            Maximum number of seconds since the last update
+        filterEnded : int
+            Maximum number of seconds since the process ended
+
+        Returns
+        -------
+        list
+            List of process entries
+        """
+        interval = cls._conf()[4]
+        with cls._lock:
+            if time.monotonic()-cls._loaded >= interval:
+                with Service("redis") as r:
+                    cls._data = cls._load(r, interval)
+                cls._loaded = time.monotonic()
+            data = cls._data
+        now = int(time.time())
+        return [entry for entry in data
+                if not (entry["ended"] != 0 and now-entry["ended"] > filterEnded or now-entry["update"] > filterUpdated)]
+
+    @classmethod
+    def _load(cls, r, interval):
+        """Get data from the shared cache or refresh it, if no other process is currently doing so."""
+        cached = r.get(cls.cacheKey)
+        if cached is not None:
+            return json.loads(cached)
+        if not r.set(cls.lockKey, 1, nx=True, ex=max(int(interval), 1)*5):
+            return cls._data
+        try:
+            data = cls._refresh(r)
+            r.set(cls.cacheKey, json.dumps(data, separators=(",", ":")), px=max(int(interval*1000), 1))
+        finally:
+            r.delete(cls.lockKey)
+        return data
+
+    @classmethod
+    def _refresh(cls, r):
+        """Read changes from the top data hash and remove expired entries."""
+        topdataKey, timestampKey, expUpd, expEnd, _ = cls._conf()
+        now = int(time.time())
+        r.set(timestampKey, now)
+        raw = dict(r.hscan_iter(topdataKey, count=1000))
+        decoded = {}
+        expiry = {}
+        for key, value in raw.items():
+            if cls._raw.get(key) == value and key in cls._decoded:
+                decoded[key] = cls._decoded[key]
+                continue
+            try:
+                entry = json.loads(value)
+                decoded[key] = entry
+                expiry[key] = entry["update"]+expUpd if entry["ended"] == 0 else \
+                    min(entry["update"]+expUpd, entry["ended"]+expEnd)
+            except Exception as err:
+                logger.warning(type(err).__name__+": "+str(err.args))
+        pipe = r.pipeline(transaction=False)
+        if expiry:
+            pipe.zadd(cls.indexKey, expiry)
+        pipe.zrangebyscore(cls.indexKey, "-inf", now)
+        expired = pipe.execute()[-1]
+        if expired:
+            pipe.hdel(topdataKey, *expired)
+            pipe.zrem(cls.indexKey, *expired)
+            pipe.execute()
+            for key in expired:
+                raw.pop(key, None)
+                decoded.pop(key, None)
+        cls._raw, cls._decoded = raw, decoded
+        return list(decoded.values())
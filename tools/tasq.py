@@ -127,9 +127,131 @@ class Worker:
             raise Exception("Missing arguments for delFolder")
         from services import Service
         with Service("exmdb") as exmdb:
-            host = task.params.get("homeserver") or exmdb.host
-            client = exmdb.ExmdbQueries(host, exmdb.port, task.params["homedir"], task.params["private"])
-            client.deleteFolder(task.params["homedir"], task.params["folderID"], task.params.get("clear", False))
+            client = exmdb.bind(task.params.get("homeserver"), task.params["homedir"], task.params["private"])
+            client.deleteFolder(task.params["folderID"], task.params.get("clear", False))
+        if not task.params["private"]:
+            from .folders import FolderCache
+            FolderCache.invalidate(task.params["homedir"])
+
+    def chat(self, task):
+        """Replay chat operations recorded by `TasQServer.mktask.chat`.
+
+        Operations re-read the current database state before contacting the chat server,
+        so replaying a task multiple times is safe. If the chat server is unavailable,
+        the task is retried with exponential backoff.
+        """
+        from orm import DB
+        from services import ServiceUnavailableError
+        from time import sleep
+        from .config import Config
+        retries = Config["chat"].get("retries", 3)
+        delay = Config["chat"].get("retryDelay", 2)
+        ops = task.params.get("ops", ())
+        attempt = 0
+        while True:
+            try:
+                DB.session.rollback()
+                for op in ops:
+                    self._chatOp(op)
+                    DB.session.commit()
+                break
+            except ServiceUnavailableError as err:
+                DB.session.rollback()
+                if attempt >= retries:
+                    raise
+                self.log("WARNING", "Chat operation failed ({}), retrying in {}s"
+                         .format(" - ".join(str(arg) for arg in err.args), delay*2**attempt))
+                sleep(delay*2**attempt)
+                attempt += 1
+        task.params["attempts"] = attempt+1
+
+    @staticmethod
+    def _chatOp(op):
+        from orm.domains import Domains
+        from orm.users import Users
+        from services import Service
+        from tools.misc import GenericObject
+        command = op.get("op")
+        if command in ("userChat", "userChatAdmin", "userUpdate"):
+            user = Users.query.filter(Users.ID == op.get("ID")).first()
+            if user is None:
+                return
+            if command == "userChat":
+                user.syncChat(op.get("value"))
+            elif command == "userChatAdmin":
+                user.syncChatAdmin(op.get("value"))
+            elif user.chatID:
+                with Service("chat") as chat:
+                    user._chatUser = chat.updateUser(user, False)
+        elif command in ("domainChat", "domainUpdate"):
+            domain = Domains.query.filter(Domains.ID == op.get("ID")).first()
+            if domain is None:
+                return
+            if command == "domainChat":
+                domain.syncChat(op.get("value"))
+            elif domain.chatID:
+                with Service("chat") as chat:
+                    domain._team = chat.updateTeam(domain)
+        elif command == "userDelete":
+            with Service("chat") as chat:
+                if chat.getUser(op.get("chatID")) is None:
+                    return
+                chatUser = GenericObject(chatID=op["chatID"])
+                chat.deleteUser(chatUser) if op.get("delete", True) else chat.activateUser(chatUser, False)
+        else:
+            raise Exception("Invalid or missing chat operation")
+
+    def domainPurge(self, task):
+        """Permanently delete a domain, reporting progress in the task message."""
+        def progress(stage, done, total):
+            nonlocal last
+            task.message = "{}: {}/{}".format(stage, done, total)
+            if time.time()-last >= updateInterval or done == total:
+                last = time.time()
+                self.bump()
+
+        from orm import DB
+        from orm.domains import Domains
+        import time
+        if "domainID" not in task.params:
+            raise Exception("Missing arguments for domainPurge")
+        updateInterval = task.params.get("updateInterval", 5)
+        last = time.time()
+        DB.session.rollback()
+        domain = Domains.query.filter(Domains.ID == task.params["domainID"]).first()
+        if domain is None:
+            raise Exception("Domain not found")
+        domain.purge(task.params.get("deleteFiles", False), progress=progress)
+        task.message = "Domain removed"
+
+    def storeSync(self, task):
+        """Write user properties recorded by `TasQServer.mktask.storeSync` to the stores.
+
+        Property values are read from the database when the task is executed,
+        so replaying a task multiple times is safe.
+        """
+        from orm import DB
+        from orm.users import Users
+        tags = {}
+        for entry in task.params.get("users", ()):
+            if entry.get("tags") is None or tags.get(entry["ID"], ()) is None:
+                tags[entry["ID"]] = None
+            else:
+                tags.setdefault(entry["ID"], set()).update(entry["tags"])
+        DB.session.rollback()
+        users = Users.query.filter(Users.ID.in_(tags)).options(*Users.syncStoresOptions()).all()
+        errors = Users.syncStores(users, {ID: userTags for ID, userTags in tags.items() if userTags is not None})
+        if errors:
+            for ID, err in errors.items():
+                self.log("WARNING", "Failed to synchronize store of user #{}: {}"
+                         .format(ID, " - ".join(str(arg) for arg in err.args)))
+            raise Exception("Failed to synchronize {} of {} stores".format(len(errors), len(users)))
+
+    def policyCache(self, task):
+        if "domainID" not in task.params:
+            raise Exception("Missing arguments for policyCache")
+        from orm.domains import Domains
+        Domains.clearSyncPolicyCache(task.params["domainID"])
 
     def ldapSync(self, task):
         def updateMessage():
@@ -139,28 +261,23 @@ class Worker:
             if counts["error"]:
                 task.message += ", {} errors".format(counts["error"])
 
-        def bump():
+        def bump(force=False):
             nonlocal last
-            if time.time()-last < updateInterval:
+            if not force and time.time()-last < updateInterval:
                 return
             updateMessage()
             last = time.time()
             self.bump()
 
         from orm import DB
-        from orm.domains import Domains
-        from orm.misc import DBConf
         from orm.users import Aliases, Users
         from services import Service
         from tools.DataModel import MismatchROError, InvalidAttributeError
-        from tools.misc import RecursiveDict
         import time
         import traceback
 
-        defaults = DBConf.getFile("grommunio-admin", "defaults-system", True).get("user", {})
-        domainDefaults = {}
-
         start = time.time()
+        timing = {}
         lang = task.params.get("lang", "")
         create = task.params.get("import", False)
         domains = task.params.get("domains")
@@ -170,6 +287,7 @@ class Worker:
         Aliases.NTactive(False)
         users = Users.query.filter(Users.externID != None, *domainFilters).all()
         syncStatus = []
+        updated = {}
         counts = {"created": 0, "synced": 0, "error": 0, "sync": len(users), "create": None}
         last = time.time()
         with Service("ldap") as ldap:
@@ -187,7 +305,9 @@ class Worker:
                     user.lang = user.lang or lang
                     syncStatus.append({"ID": user.ID, "username": user.username, "code": 200,
                                        "message": "Synchronization successful"})
+                    userID, changed = user.ID, set(user.properties.dirty)
                     DB.session.commit()
+                    updated[userID] = changed
                 except (MismatchROError, InvalidAttributeError, ValueError):
                     self.log("ERROR", traceback.format_exc())
                     syncStatus.append({"ID": user.ID, "username": user.username, "code": 500,
@@ -200,50 +320,177 @@ class Worker:
                                        "message": "Unknown error"})
                     DB.session.rollback()
                     counts["error"] += 1
+            timing["sync"] = time.time()-start
+            self._ldapSyncStores(updated, syncStatus, counts)
+            timing["stores"] = time.time()-start-timing["sync"]
             if create:
-                synced = {user.externID for user in users}
-                candidates = ldap.searchUsers(None, domains=(d["domainname"] for d in domains)
-                                              if domains is not None else None, limit=None)
-                candidates = [candidate for candidate in candidates if candidate.ID not in synced]
-                counts["create"] = len(candidates)
-                for candidate in candidates:
-                    user = Users.query.filter((Users.externID == candidate.ID) | (Users.username == candidate.email)).first()
-                    if user is not None:
-                        syncStatus.append({"ID": user.ID, "username": user.username, "code": 409,
-                                           "message": "Exists but not linked to LDAP object"})
-                        counts["error"] += 1
-                        continue
-                    domain = Domains.query.filter(Domains.domainname == candidate.email.split("@")[1])\
-                                          .with_entities(Domains.ID).first()
-                    if domain.ID not in domainDefaults:
-                        domainDefaults[domain.ID] = DBConf.getFile("grommunio-admin", "defaults-domain-"+str(domain.ID), True)\
-                                                    .get("user", {})
-                    userData = RecursiveDict(defaults)
-                    userData.update(domainDefaults[domain.ID])
-                    userData.update(RecursiveDict(ldap.downsyncUser(candidate.ID)))
-                    if userData is None:
-                        syncStatus.append({"username": candidate.email, "code": 500, "message":
-                                           "Error retrieving userdata"})
-                        counts["error"] += 1
-                        continue
-
-                    userData["lang"] = lang
-                    result, code = Users.create(userData, externID=candidate.ID)
-                    if code != 201:
-                        syncStatus.append({"username": candidate.email, "code": code, "message": result})
-                        counts["error"] += 1
-                        continue
-                    counts["created"] += 1
-                    syncStatus.append({"ID": result.ID, "username": result.username, "code": 201,
-                                       "message": "User created"})
+                self._ldapImport(task, ldap, {user.externID for user in users}, syncStatus, counts, timing, bump)
             Users.NTactive(False)
             Aliases.NTactive(False)
             Users.NTcommit()
         updateMessage()
-        task.message += " ({:.1f}s)".format(time.time()-start)
+        if counts["error"]:
+            self.log("WARNING", "LDAP synchronization finished with errors: "+task.message)
+        timing["total"] = time.time()-start
+        task.message += " ({:.1f}s)".format(timing["total"])
         task.params["result"] = syncStatus
+        task.params["stats"] = {"timing": {stage: round(duration, 3) for stage, duration in timing.items()}}
+        if counts["created"] and timing.get("provision"):
+            task.params["stats"]["throughput"] = round(counts["created"]/timing["provision"], 2)
+
+    def _ldapSyncStores(self, changed, syncStatus, counts):
+        """Write modified properties of synchronized users to their stores."""
+        from orm.users import Users
+        from services import ServiceUnavailableError
+        changed = {ID: tags for ID, tags in changed.items() if tags}
+        if not changed:
+            return
+        users = Users.query.filter(Users.ID.in_(changed)).options(*Users.syncStoresOptions()).all()
+        try:
+            errors = Users.syncStores(users, changed)
+        except ServiceUnavailableError:
+            self.log("WARNING", "Failed to synchronize stores: exmdb service not available")
+            return
+        if not errors:
+            return
+        for status in syncStatus:
+            if status.get("ID") in errors:
+                status["code"] = 500
+                status["message"] = "Store synchronization failed: " +\
+                    " - ".join(str(arg) for arg in errors[status["ID"]].args)
+        counts["error"] += len(errors)
+
+    def _ldapImport(self, task, ldap, synced, syncStatus, counts, timing, bump):
+        """Import LDAP users that do not exist yet.
+
+        Conflicting users, domains and domain defaults are fetched in bulk, LDAP data is downloaded in batches and
+        users are created by a bounded pool of threads while the next batch is being downloaded.
+
+        Parameters
+        ----------
+        task : Task
+            The ldapSync task
+        ldap : LdapService
+            LDAP service to use
+        synced : set
+            externIDs of users that are already linked
+        syncStatus : list
+            List to append status reports to
+        counts : dict
+            Task counters
+        timing : dict
+            Dictionary to store stage durations in
+        bump : function
+            Progress callback
+        """
+        def report(username, code, message, ID=None):
+            syncStatus.append({"username": username, "code": code, "message": message} if ID is None else
+                              {"ID": ID, "username": username, "code": code, "message": message})
+            counts["error" if code != 201 else "created"] += 1
+            if code != 201:
+                self.log("WARNING", "Failed to import '{}' ({}): {}".format(username, code, message))
+
+        def createUser(candidate, userData):
+            try:
+                result, code = Users.create(userData, externID=candidate.ID)
+                return (result.ID, result.username, code) if code == 201 else (None, candidate.email, code, result)
+            except Exception as err:
+                return None, candidate.email, 500, "Failed to create user "+" - ".join(str(arg) for arg in err.args)
+            finally:
+                DB.session.remove()
+
+        def collect(futures, block):
+            for future in (concurrent.futures.as_completed(futures) if block else [f for f in futures if f.done()]):
+                futures.remove(future)
+                result = future.result()
+                if result[2] == 201:
+                    report(result[1], 201, "User created", result[0])
+                else:
+                    report(result[1], result[2], result[3])
+            bump()
+
+        from orm import DB
+        from orm.domains import Domains
+        from orm.misc import DBConf
+        from orm.users import Users
+        from tools.config import Config
+        from tools.license import getLicense
+        from tools.misc import RecursiveDict
+        import concurrent.futures
+        import time
+
+        stageStart = time.time()
+        domains = task.params.get("domains")
+        lang = task.params.get("lang", "")
+        batchSize = task.params.get("batchSize", 250)
+        workers = task.params.get("workers") or Config["tasq"].get("importWorkers", 4)
+        candidates = ldap.searchUsers(None, domains=(d["domainname"] for d in domains) if domains is not None else None,
+                                      limit=None)
+        candidates = [candidate for candidate in candidates if candidate.ID not in synced]
+        counts["create"] = len(candidates)
+        timing["search"] = time.time()-stageStart
+        if not candidates:
+            return
+
+        stageStart = time.time()
+        conflicts = Users.query.filter(Users.externID.in_([c.ID for c in candidates]) |
+                                       Users.username.in_([c.email for c in candidates]))\
+                               .with_entities(Users.ID, Users.username, Users.externID).all()
+        conflicts = {key: conflict for conflict in conflicts for key in (conflict.externID, conflict.username)
+                     if key is not None}
+        domainnames = {c.email.split("@", 1)[1] for c in candidates if "@" in c.email}
+        domainMap = {domain.domainname: domain for domain in
+                     Domains.query.filter(Domains.domainname.in_(domainnames))
+                                  .with_entities(Domains.ID, Domains.domainname, Domains.maxUser).all()}
+        capacity = {domain.ID: domain.maxUser-Users.count(Users.domainID == domain.ID) for domain in domainMap.values()}
+        licenseCapacity = getLicense().users-Users.count()
+        defaults = DBConf.getFile("grommunio-admin", "defaults-system", True).get("user", {})
+        domainDefaults = {domain.ID: DBConf.getFile("grommunio-admin", "defaults-domain-"+str(domain.ID), True).get("user", {})
+                          for domain in domainMap.values()}
+        importable = []
+        for candidate in candidates:
+            conflict = conflicts.get(candidate.ID) or conflicts.get(candidate.email)
+            domain = domainMap.get(candidate.email.split("@", 1)[-1])
+            if conflict is not None:
+                report(conflict.username, 409, "Exists but not linked to LDAP object", conflict.ID)
+            elif domain is None:
+                report(candidate.email, 400, "Invalid domain")
+            elif licenseCapacity <= 0:
+                report(candidate.email, 400, "License user limit exceeded")
+            elif capacity[domain.ID] <= 0:
+                report(candidate.email, 400, "Maximum number of domain users reached")
+            else:
+                capacity[domain.ID] -= 1
+                licenseCapacity -= 1
+                importable.append((candidate, domain))
+        DB.session.commit()
+        timing["prefetch"] = time.time()-stageStart
+
+        timing["download"] = 0
+        stageStart = time.time()
+        futures = set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="TasQ Import") as executor:
+            for offset in range(0, len(importable), batchSize):
+                batch = importable[offset:offset+batchSize]
+                downloadStart = time.time()
+                userdata = ldap.downsyncUsers([candidate.ID for candidate, _ in batch], batchSize)
+                timing["download"] += time.time()-downloadStart
+                for candidate, domain in batch:
+                    if userdata.get(candidate.ID) is None:
+                        report(candidate.email, 500, "Error retrieving userdata")
+                        continue
+                    userData = RecursiveDict(defaults)
+                    userData.update(domainDefaults[domain.ID])
+                    userData.update(RecursiveDict(userdata[candidate.ID]))
+                    userData["lang"] = lang
+                    futures.add(executor.submit(createUser, candidate, userData))
+                collect(futures, False)
+            collect(futures, True)
+        timing["provision"] = time.time()-stageStart
+        bump(True)
 
-    cmap = {"control": control, "debug": debug, "delFolder": deleteFolder, "ldapSync": ldapSync}
+    cmap = {"chat": chat, "control": control, "debug": debug, "delFolder": deleteFolder, "domainPurge": domainPurge,
+            "ldapSync": ldapSync, "policyCache": policyCache, "storeSync": storeSync}
 
 
 class TasQServer:
@@ -261,6 +508,7 @@ class TasQServer:
     _active_lock = threading.Lock()
     _localID = 0
     _workers = []
+    _outboxSession = None
 
     @classmethod
     def _schedule(cls, task):
@@ -318,6 +566,95 @@ class TasQServer:
             cls._localID -= 1
             return cls._schedule(Task(cls._localID, command, params))
 
+    @classmethod
+    def defer(cls, command, params, permission=None, append=None):
+        """Create a task that is executed after the current transaction is committed.
+
+        The task is stored in the same transaction as the changes it refers to,
+        so it is discarded if the transaction is rolled back and cannot get lost
+        once the changes are committed. The task is stored as queued and claimed
+        by this server after the commit, so it is still picked up by `pull` if
+        the claim fails.
+
+        Parameters
+        ----------
+        command : str
+            Name of the command
+        params : dict
+            Command specific parameters
+        permission : PermissionBase, optional
+            Restrict access to users with permission. The default is None.
+        append : str, optional
+            Name of a list parameter. If a task with the same command is already pending in the
+            current transaction, the list is appended to the pending task instead of creating a new one.
+            The default is None.
+
+        Returns
+        -------
+        orm.misc.TasQ
+            The pending database task, or None if the TasQ server is not running in online mode.
+            In the latter case, the caller is responsible for executing the operation immediately.
+        """
+        if command == "control":
+            raise ValueError("Cannot create control commands")
+        if not cls.running() or not cls.online():
+            return None
+        from orm.misc import DB, TasQ
+        if cls._outboxSession is not DB.session:
+            from sqlalchemy import event
+            event.listen(DB.session, "before_commit", cls._outboxFlush)
+            event.listen(DB.session, "after_commit", cls._outboxSchedule)
+            event.listen(DB.session, "after_rollback", cls._outboxClear)
+            cls._outboxSession = DB.session
+        outbox = DB.session().info.setdefault("tasqOutbox", [])
+        if append is not None:
+            for dbtask in outbox:
+                if dbtask.command == command:
+                    pending = dbtask.params
+                    pending[append] = pending.get(append, [])+params.get(append, [])
+                    dbtask.params = pending
+                    return dbtask
+        dbtask = TasQ(dict(command=command, params=params))
+        dbtask.state = Task.QUEUED
+        dbtask.permission = permission
+        DB.session.add(dbtask)
+        outbox.append(dbtask)
+        return dbtask
+
+    @classmethod
+    def _outboxFlush(cls, session):
+        outbox = session.info.pop("tasqOutbox", None)
+        if not outbox:
+            return
+        session.flush()
+        session.info["tasqScheduled"] = [Task(dbtask.ID, dbtask.command, dbtask.params) for dbtask in outbox]
+
+    @classmethod
+    def _outboxSchedule(cls, session):
+        tasks = session.info.pop("tasqScheduled", None)
+        if not tasks:
+            return
+        from datetime import datetime
+        from orm.misc import DB, TasQ
+        from sqlalchemy.exc import SQLAlchemyError
+        table = TasQ.__table__
+        try:
+            with DB.engine.begin() as conn:
+                claimed = [task for task in tasks
+                           if conn.execute(table.update().where(table.c.id == task.ID, table.c.state == Task.QUEUED)
+                                           .values(state=Task.LOADED, updated=datetime.now())).rowcount]
+        except SQLAlchemyError as err:
+            logger.warning("Failed to claim deferred tasks, leaving them for import: "+
+                           " - ".join(str(arg) for arg in err.args))
+            return
+        for task in claimed:
+            cls._schedule(task)
+
+    @staticmethod
+    def _outboxClear(session):
+        session.info.pop("tasqOutbox", None)
+        session.info.pop("tasqScheduled", None)
+
     @classmethod
     def start(cls, workers=None, online=True):
         """Start the TasQ server.
@@ -543,6 +880,18 @@ class TasQServer:
             logger.debug("Task #{} completed ({})".format(task.ID, task.statename))
 
     class mktask:
+        @staticmethod
+        def chat(op, **params):
+            return TasQServer.defer("chat", dict(ops=[dict(op=op, **params)]), append="ops")
+
+        @staticmethod
+        def domainPurge(domainID, deleteFiles=False, permission=None):
+            return TasQServer.create("domainPurge", dict(domainID=domainID, deleteFiles=deleteFiles), permission=permission)
+
+        @staticmethod
+        def storeSync(userID, tags=None):
+            return TasQServer.defer("storeSync", dict(users=[dict(ID=userID, tags=tags)]), append="users")
+
         @staticmethod
         def deleteFolder(homedir, folderID, private, clear=False, permission=None, homeserver=None):
             return TasQServer.create("delFolder", dict(homedir=homedir, folderID=folderID, private=private, clear=clear,